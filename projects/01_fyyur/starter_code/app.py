@@ -4,92 +4,191 @@
 import logging
 from logging import Formatter, FileHandler
 import babel
+import babel.dates
 import dateutil.parser
-from flask import Flask, render_template, request, flash, redirect, url_for
+from flask import Blueprint, Flask, Response, current_app, jsonify, render_template, request, flash, redirect, \
+    url_for, abort, stream_with_context
 from flask_migrate import Migrate
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
 from forms import *
+from models import db, setup_db, Venue, Artist, Show, Genre, venue_genres, artist_genres, genres_from_names, \
+    double_booked, DEFAULT_SHOW_DURATION, MAX_SHOW_DURATION
+from counters import record_show_added
+from commands import fyyur_cli
+from compression import CompressionMiddleware
+from assets import static_assets
+from autocomplete import autocomplete, KINDS as AUTOCOMPLETE_KINDS
+from cache import page_cache
+from deletion import delete_listings, BULK_DELETE_LIMIT, SIDES
+from conditional import conditional, touch, touch_venue_pages, touch_artist_pages, \
+    venue_validator, artist_validator, venues_validator, artists_validator, shows_validator
+from exporter import export
+from metrics import metrics
+from pagination import keyset_page
+from pooling import pool_stats
+from querybudget import query_budget
+from replicas import replicas
+from search import search_by_name, SEARCH_RESULTS_PER_PAGE
+from templating import init_bytecode_cache
 import datetime
+import functools
+import geo
+import os
+import weakref
+from itertools import groupby
 from sqlalchemy import exc
+from sqlalchemy.orm import joinedload, selectinload
 
 # ----------------------------------------------------------------------------#
 # App Config.
 # ----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+bp = Blueprint('fyyur', __name__)
+moment = Moment()
+migrate = Migrate()
+
+
+def create_app(test_config=None):
+    # a prefork server may call this once and fork its workers from the result, see wsgi.py
+    app = Flask(__name__)
+    app.config.from_object('config')
+    if test_config is not None:
+        app.config.update(test_config)
+    if not app.config['SECRET_KEY']:
+        # every worker and restart needs the same key, or sessions and flashed messages are lost between them
+        app.logger.warning('SECRET_KEY is not set; using a random key for this process only.')
+        app.config['SECRET_KEY'] = os.urandom(32)
+    moment.init_app(app)
+    setup_db(app)
+    migrate.init_app(app, db)
+    app.cli.add_command(fyyur_cli)
+    page_cache.init_app(app)
+    metrics.init_app(app)
+    replicas.init_app(app)
+    autocomplete.init_app(app)
+    app.register_blueprint(bp)
+    static_assets.init_app(app)
+    init_bytecode_cache(app)
+    init_error_log(app)
+    app.wsgi_app = CompressionMiddleware(app.wsgi_app, app.config['COMPRESSION_LEVELS'],
+                                         app.config['COMPRESSION_MIN_SIZE'])
+    built_apps.add(app)
+    return app
+
+
+def init_error_log(app):
+    path = app.config.get('ERROR_LOG')
+    if app.debug or app.testing or not path:
+        return
+    # delay: the file is opened by the worker that first logs, not by the process that builds the app
+    file_handler = FileHandler(path, delay=True)
+    file_handler.setFormatter(
+        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+    )
+    app.logger.setLevel(logging.INFO)
+    file_handler.setLevel(logging.INFO)
+    app.logger.addHandler(file_handler)
+
+
+# the apps built in this process and still alive; held weakly, so a discarded app is not kept for the fork hook
+built_apps = weakref.WeakSet()
+
+
+def dispose_engines():
+    # runs in each forked child: pooled connections inherited from the parent share its sockets,
+    # so drop them, without closing them under the parent, and let the worker open its own
+    for app in list(built_apps):
+        db.get_engine(app).dispose(close=False)
+    replicas.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=dispose_engines)
 
 
 # ----------------------------------------------------------------------------#
-# Models.
+# Filters.
 # ----------------------------------------------------------------------------#
 
-class Venue(db.Model):
-    __tablename__ = 'Venue'
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(), nullable=False)
-    city = db.Column(db.String(120), nullable=False)
-    state = db.Column(db.String(120), nullable=False)
-    address = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-    website = db.Column(db.String(120))
-    genres = db.Column(db.String())
-    seeking_talent = db.Column(db.Boolean)
-    seeking_description = db.Column(db.String())
-    shows = db.relationship('Show', backref='venue', lazy=True)
-
-
-class Artist(db.Model):
-    __tablename__ = 'Artist'
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String, nullable=False)
-    city = db.Column(db.String(120), nullable=False)
-    state = db.Column(db.String(120), nullable=False)
-    phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-    website = db.Column(db.String(120))
-    seeking_venue = db.Column(db.Boolean)
-    seeking_description = db.Column(db.String())
-    shows = db.relationship('Show', backref='artist', lazy=True)
-
-
-class Show(db.Model):
-    __tablename__ = 'Show'
-    id = db.Column(db.Integer, primary_key=True)
-    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
-    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
-    start_time = db.Column(db.DateTime(), nullable=False)
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@functools.lru_cache(maxsize=64)
+def compile_datetime_format(s_format, locale):
+    # resolving the pattern and locale is most of the per-call cost, do it once per pair
+    return babel.dates.parse_pattern(DATETIME_FORMATS.get(s_format, s_format)), babel.Locale.parse(locale)
+
+
+@bp.app_template_filter('datetime')
+def format_datetime(value, s_format='medium', locale=None):
+    if not isinstance(value, datetime.datetime):
+        value = dateutil.parser.parse(value)
+    pattern, locale = compile_datetime_format(s_format, locale or current_app.config['DATETIME_LOCALE'])
+    return babel.dates.format_datetime(value, pattern, locale=locale)
 
 
 # ----------------------------------------------------------------------------#
-# Filters.
+# Form helpers.
+# ----------------------------------------------------------------------------#
+
+def coordinates(form):
+    # (latitude, longitude) from a venue form; (None, None) unless both are valid
+    try:
+        lat, lng = float(form.get('latitude', '')), float(form.get('longitude', ''))
+    except ValueError:
+        return None, None
+    if -90 <= lat <= 90 and -180 <= lng <= 180:
+        return lat, lng
+    return None, None
+
+
+# ----------------------------------------------------------------------------#
+# Page cache keys.
 # ----------------------------------------------------------------------------#
 
-def format_datetime(value, s_format='medium'):
-    date = dateutil.parser.parse(value)
-    if s_format == 'full':
-        s_format = "EEEE MMMM, d, y 'at' h:mma"
-    elif s_format == 'medium':
-        s_format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, s_format, locale='en')
+def venue_page_keys(*venue_ids):
+    # the venue pages plus every artist page listing a show at one of them
+    artist_ids = db.session.query(Show.artist_id).filter(Show.venue_id.in_(venue_ids)).distinct()
+    return ['venue:%s' % venue_id for venue_id in venue_ids] + \
+        ['artist:%s' % artist_id for (artist_id,) in artist_ids]
+
+
+def artist_page_keys(*artist_ids):
+    venue_ids = db.session.query(Show.venue_id).filter(Show.artist_id.in_(artist_ids)).distinct()
+    return ['artist:%s' % artist_id for artist_id in artist_ids] + \
+        ['venue:%s' % venue_id for (venue_id,) in venue_ids]
+
+
+PAGE_KEYS = {Venue: venue_page_keys, Artist: artist_page_keys}
 
 
-app.jinja_env.filters['datetime'] = format_datetime
+def delete_and_evict(model, ids):
+    # deletes in one transaction, then evicts the cached pages that showed the listings
+    fk_column, other_fk_column, other = SIDES[model]
+    try:
+        stale_pages = PAGE_KEYS[model](*ids)
+        # the other side of their shows, whose upcoming show counts drop
+        other_ids = [id for (id,) in db.session.query(other_fk_column).filter(fk_column.in_(ids)).distinct()]
+        deleted = delete_listings(model, ids)
+        db.session.commit()
+    except exc.SQLAlchemyError:
+        db.session.rollback()
+        abort(500)
+    finally:
+        db.session.close()
+    page_cache.evict(*stale_pages)
+    autocomplete.refresh(model, deleted)
+    autocomplete.refresh(other, other_ids)
+    return deleted
 
 
 # ----------------------------------------------------------------------------#
 # Controllers.
 # ----------------------------------------------------------------------------#
 
-@app.route('/')
+@bp.route('/')
 def index():
     return render_template('pages/home.html')
 
@@ -97,66 +196,69 @@ def index():
 #  Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
+@bp.route('/venues')
+@query_budget(2)
+@conditional(venues_validator)
 def venues():
-    all_venues = Venue.query.all()
-    obj = {}
-    for venue in all_venues:
-        obj[venue.state + '&' + venue.city] = []
-
-    for venue in all_venues:
-        num_upcoming_shows = len(
-            Show.query.filter(Show.start_time > datetime.datetime.now(), Show.venue_id == venue.id).all())
-        obj[venue.state + '&' + venue.city].append({
-            "id": venue.id,
-            "name": venue.name,
-            "num_upcoming_shows": num_upcoming_shows,
-        })
+    genre = request.args.get('genre')
+    query = db.session.query(Venue.city, Venue.state, Venue.id, Venue.name,
+                             Venue.upcoming_shows_count.label('num_upcoming_shows'))
+    if genre:
+        query = query.join(venue_genres, venue_genres.c.venue_id == Venue.id) \
+            .join(Genre, Genre.id == venue_genres.c.genre_id) \
+            .filter(Genre.name == genre)
+    rows = query.order_by(Venue.state, Venue.city, Venue.id).all()
     data = []
-    for key, value in obj.items():
+    for (city, state), area_venues in groupby(rows, key=lambda row: (row.city, row.state)):
         data.append({
-            "city": key.split("&")[1],
-            "state": key.split("&")[0],
-            "venues": value
+            "city": city,
+            "state": state,
+            "venues": [{
+                "id": venue.id,
+                "name": venue.name,
+                "num_upcoming_shows": venue.num_upcoming_shows,
+            } for venue in area_venues]
         })
-    return render_template('pages/venues.html', areas=data)
+    return render_template('pages/venues.html', areas=data, genre=genre)
 
 
-@app.route('/venues/search', methods=['POST'])
+@bp.route('/venues/search', methods=['POST'])
+@query_budget(2)
 def search_venues():
     # search for Hop should return "The Musical Hop".
     # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
     search_term = request.form.get('search_term', '')
-    all_venues = Venue.query.all()
+    page = max(request.form.get('page', 1, type=int), 1)
+    total, matches = search_by_name(Venue, search_term, page)
     response = {
-        "count": 0,
-        "data": []
+        "count": total,
+        "page": page,
+        "has_prev": page > 1,
+        "has_next": page * SEARCH_RESULTS_PER_PAGE < total,
+        "data": [{
+            "id": match.id,
+            "name": match.name,
+            "num_upcoming_shows": match.upcoming_shows_count,
+        } for match in matches]
     }
-    for venue in all_venues:
-        num_upcoming_shows = len(
-            Show.query.filter(Show.start_time > datetime.datetime.now(), Show.venue_id == venue.id).all())
-        if search_term.lower() in venue.name.lower():
-            response["data"].append({
-                "id": venue.id,
-                "name": venue.name,
-                "num_upcoming_shows": num_upcoming_shows,
-            })
-    response["count"] = len(response["data"])
     return render_template('pages/search_venues.html', results=response,
                            search_term=search_term)
 
 
-@app.route('/venues/<int:venue_id>')
+@bp.route('/venues/<int:venue_id>')
+@query_budget(3)
+@conditional(venue_validator)
+@page_cache.cached('venue:{venue_id}')
 def show_venue(venue_id):
     # shows the venue page with the given venue_id
-    tests = db.session.query(Show).join(Artist).filter(Show.venue_id == venue_id).all()
-    venue = Venue.query.get(venue_id)
-    past_shows = Show.query.filter(Show.start_time <= datetime.datetime.now(), Show.venue_id == venue_id).all()
-    future_shows = Show.query.filter(Show.start_time > datetime.datetime.now(), Show.venue_id == venue_id).all()
+    venue = Venue.query.options(joinedload(Venue.shows).joinedload(Show.artist),
+                                selectinload(Venue.genres)).get(venue_id)
+    if venue is None:
+        abort(404)
     venue_copy = {
         "id": venue.id,
         "name": venue.name,
-        "genres": [venue.genres],
+        "genres": [genre.name for genre in venue.genres],
         "address": venue.address,
         "city": venue.city,
         "state": venue.state,
@@ -168,36 +270,73 @@ def show_venue(venue_id):
         "image_link": venue.image_link,
         "past_shows": [],
         "upcoming_shows": [],
-        "past_shows_count": len(past_shows),
-        "upcoming_shows_count": len(future_shows),
     }
-    for past_show in past_shows:
-        venue_copy['past_shows'].append({
-            "artist_id": past_show.artist.id,
-            "artist_name": past_show.artist.name,
-            "artist_image_link": past_show.artist.image_link,
-            "start_time": str(past_show.start_time)
-        })
-    for future_show in future_shows:
-        venue_copy['upcoming_shows'].append({
-            "artist_id": future_show.artist.id,
-            "artist_name": future_show.artist.name,
-            "artist_image_link": future_show.artist.image_link,
-            "start_time": str(future_show.start_time)
+    now = datetime.datetime.now()
+    for show in sorted(venue.shows, key=lambda show: show.start_time):
+        venue_copy['upcoming_shows' if show.start_time > now else 'past_shows'].append({
+            "artist_id": show.artist.id,
+            "artist_name": show.artist.name,
+            "artist_image_link": show.artist.image_link,
+            "start_time": show.start_time
         })
+    venue_copy['past_shows_count'] = len(venue_copy['past_shows'])
+    venue_copy['upcoming_shows_count'] = len(venue_copy['upcoming_shows'])
     return render_template('pages/show_venue.html', venue=venue_copy)
 
 
+NEARBY_DEFAULT_RADIUS_KM = 10
+NEARBY_MAX_RADIUS_KM = 500
+NEARBY_LIMIT = 50
+
+
+@bp.route('/venues/nearby')
+@query_budget(1)
+def venues_nearby():
+    # venues within radius km of (lat, lng), nearest first, as JSON
+    lat = request.args.get('lat', type=float)
+    lng = request.args.get('lng', type=float)
+    radius = request.args.get('radius', NEARBY_DEFAULT_RADIUS_KM, type=float)
+    limit = request.args.get('limit', NEARBY_LIMIT, type=int)
+    if lat is None or lng is None or not (-90 <= lat <= 90 and -180 <= lng <= 180) \
+            or not 0 < radius <= NEARBY_MAX_RADIUS_KM or limit < 1:
+        abort(400)
+    query = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state, Venue.latitude, Venue.longitude,
+                             Venue.upcoming_shows_count).filter(Venue.geohash.isnot(None))
+    prefixes = geo.covering_prefixes(lat, lng, radius)
+    if prefixes != ['']:
+        # one index range per cell; padding with the last base32 digit keeps the bounds alphanumeric
+        query = query.filter(db.or_(*[Venue.geohash.between(prefix, prefix.ljust(geo.PRECISION, 'z'))
+                                      for prefix in prefixes]))
+    nearby = []
+    for venue in query:
+        distance = geo.distance_km(lat, lng, venue.latitude, venue.longitude)
+        if distance <= radius:
+            nearby.append((distance, venue))
+    nearby.sort(key=lambda item: item[0])
+    nearby = nearby[:min(limit, NEARBY_LIMIT)]
+    return jsonify({
+        "count": len(nearby),
+        "data": [{
+            "id": venue.id,
+            "name": venue.name,
+            "city": venue.city,
+            "state": venue.state,
+            "distance_km": round(distance, 3),
+            "num_upcoming_shows": venue.upcoming_shows_count,
+        } for distance, venue in nearby]
+    })
+
+
 #  Create Venue
 #  ----------------------------------------------------------------
 
-@app.route('/venues/create', methods=['GET'])
+@bp.route('/venues/create', methods=['GET'])
 def create_venue_form():
     form = VenueForm()
     return render_template('forms/new_venue.html', form=form)
 
 
-@app.route('/venues/create', methods=['POST'])
+@bp.route('/venues/create', methods=['POST'])
 def create_venue_submission():
     my_venue = {}
     form = request.form
@@ -205,10 +344,12 @@ def create_venue_submission():
         my_venue = Venue(name=form['name'], city=form['city'], state=form['state'], address=form['address'],
                          phone=form['phone'], facebook_link=form['facebook_link'],
                          image_link="https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60",
-                         seeking_talent=True, genres=",".join(request.form.getlist('genres')))
+                         seeking_talent=True, genres=genres_from_names(request.form.getlist('genres')))
+        my_venue.latitude, my_venue.longitude = coordinates(form)
         # on successful db insert, flash success
         db.session.add(my_venue)
         db.session.commit()
+        autocomplete.refresh(Venue, [my_venue.id])
         flash('Venue ' + request.form['name'] + ' was successfully listed!')
     except exc.SQLAlchemyError:
         db.session.rollback()
@@ -220,68 +361,92 @@ def create_venue_submission():
     return render_template('pages/home.html')
 
 
-@app.route('/venues/<venue_id>', methods=['DELETE'])
+@bp.route('/venues/<int:venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
-    # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
-    try:
-        Venue.query.filter_by(id=venue_id).delete()
-        db.session.commit()
-    except exc.SQLAlchemyError:
-        db.session.rollback()
-    finally:
-        db.session.close()
-    # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
-    # clicking that button delete it from the db then redirect the user to the homepage
-    return None
+    # shows and genre links go with the venue (ON DELETE CASCADE)
+    if not delete_and_evict(Venue, [venue_id]):
+        abort(404)
+    return jsonify({"success": True, "deleted": [venue_id]})
+
+
+@bp.route('/<any(venues, artists):kind>/delete', methods=['POST'])
+def bulk_delete(kind):
+    # {"ids": [...]} deletes up to BULK_DELETE_LIMIT venues or artists in one transaction
+    ids = (request.get_json(silent=True) or {}).get('ids')
+    if not isinstance(ids, list) or not 0 < len(ids) <= BULK_DELETE_LIMIT \
+            or not all(isinstance(id, int) and not isinstance(id, bool) for id in ids):
+        abort(400)
+    ids = list(dict.fromkeys(ids))
+    deleted = delete_and_evict(Venue if kind == 'venues' else Artist, ids)
+    return jsonify({
+        "success": True,
+        "deleted": deleted,
+        "not_found": sorted(set(ids) - set(deleted)),
+    })
 
 
 #  Artists
 #  ----------------------------------------------------------------
-@app.route('/artists')
+@bp.route('/artists')
+@query_budget(2)
+@conditional(artists_validator)
 def artists():
+    genre = request.args.get('genre')
+    query = db.session.query(Artist.id, Artist.name)
+    if genre:
+        query = query.join(artist_genres, artist_genres.c.artist_id == Artist.id) \
+            .join(Genre, Genre.id == artist_genres.c.genre_id) \
+            .filter(Genre.name == genre)
+    try:
+        page = keyset_page(query, (Artist.name, Artist.id),
+                           after=request.args.get('after'), before=request.args.get('before'))
+    except ValueError:
+        abort(400)
     data = []
-    all_artists = Artist.query.all()
-    for artist in all_artists:
+    for artist in page.items:
         data.append({
             "id": artist.id,
             "name": artist.name
         })
-    return render_template('pages/artists.html', artists=data)
+    return render_template('pages/artists.html', artists=data, page=page, genre=genre)
 
 
-@app.route('/artists/search', methods=['POST'])
+@bp.route('/artists/search', methods=['POST'])
+@query_budget(2)
 def search_artists():
     # search for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
     # search for "band" should return "The Wild Sax Band".
     search_term = request.form.get('search_term', '')
-    all_artists = Artist.query.all()
+    page = max(request.form.get('page', 1, type=int), 1)
+    total, matches = search_by_name(Artist, search_term, page)
     response = {
-        "count": 0,
-        "data": []
+        "count": total,
+        "page": page,
+        "has_prev": page > 1,
+        "has_next": page * SEARCH_RESULTS_PER_PAGE < total,
+        "data": [{
+            "id": match.id,
+            "name": match.name,
+            "num_upcoming_shows": match.upcoming_shows_count,
+        } for match in matches]
     }
-    for artist in all_artists:
-        num_upcoming_shows = len(
-            Show.query.filter(Show.start_time > datetime.datetime.now(), Show.artist_id == artist.id).all())
-        if search_term.lower() in artist.name.lower():
-            response["data"].append({
-                "id": artist.id,
-                "name": artist.name,
-                "num_upcoming_shows": num_upcoming_shows,
-            })
-    response["count"] = len(response["data"])
     return render_template('pages/search_artists.html', results=response,
                            search_term=search_term)
 
 
-@app.route('/artists/<int:artist_id>')
+@bp.route('/artists/<int:artist_id>')
+@query_budget(3)
+@conditional(artist_validator)
+@page_cache.cached('artist:{artist_id}')
 def show_artist(artist_id):
-    desired_artist = Artist.query.get(artist_id)
-    past_shows = Show.query.filter(Show.start_time <= datetime.datetime.now(), Show.artist_id == artist_id).all()
-    future_shows = Show.query.filter(Show.start_time > datetime.datetime.now(), Show.artist_id == artist_id).all()
+    desired_artist = Artist.query.options(joinedload(Artist.shows).joinedload(Show.venue),
+                                          selectinload(Artist.genres)).get(artist_id)
+    if desired_artist is None:
+        abort(404)
     artist_copy = {
         "id": desired_artist.id,
         "name": desired_artist.name,
-        "genres": [desired_artist.genres],
+        "genres": [genre.name for genre in desired_artist.genres],
         "city": desired_artist.city,
         "state": desired_artist.state,
         "phone": desired_artist.phone,
@@ -292,36 +457,37 @@ def show_artist(artist_id):
         "image_link": desired_artist.image_link,
         "past_shows": [],
         "upcoming_shows": [],
-        "past_shows_count": len(past_shows),
-        "upcoming_shows_count": len(future_shows),
     }
-    for past_show in past_shows:
-        artist_copy['past_shows'].append({
-            "venue_id": past_show.venue.id,
-            "venue_name": past_show.venue.name,
-            "venue_image_link": past_show.venue.image_link,
-            "start_time": str(past_show.start_time)
-        })
-    for future_show in future_shows:
-        artist_copy['upcoming_shows'].append({
-            "venue_id": future_show.venue.id,
-            "venue_name": future_show.venue.name,
-            "venue_image_link": future_show.venue.image_link,
-            "start_time": str(future_show.start_time)
+    now = datetime.datetime.now()
+    for show in sorted(desired_artist.shows, key=lambda show: show.start_time):
+        artist_copy['upcoming_shows' if show.start_time > now else 'past_shows'].append({
+            "venue_id": show.venue.id,
+            "venue_name": show.venue.name,
+            "venue_image_link": show.venue.image_link,
+            "start_time": show.start_time
         })
+    artist_copy['past_shows_count'] = len(artist_copy['past_shows'])
+    artist_copy['upcoming_shows_count'] = len(artist_copy['upcoming_shows'])
     return render_template('pages/show_artist.html', artist=artist_copy)
 
 
+@bp.route('/artists/<int:artist_id>', methods=['DELETE'])
+def delete_artist(artist_id):
+    if not delete_and_evict(Artist, [artist_id]):
+        abort(404)
+    return jsonify({"success": True, "deleted": [artist_id]})
+
+
 #  Update
 #  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
     form = ArtistForm()
     desired_artist = Artist.query.get(artist_id)
     artist = {
         "id": desired_artist.id,
         "name": desired_artist.name,
-        "genres": [desired_artist.genres],
+        "genres": [genre.name for genre in desired_artist.genres],
         "city": desired_artist.city,
         "state": desired_artist.state,
         "phone": desired_artist.phone,
@@ -332,7 +498,7 @@ def edit_artist(artist_id):
         "image_link": desired_artist.image_link,
     }
     form.name.data = artist['name']
-    form.genres.data = [(genre, genre) for genre in artist["genres"][0].split(",")]
+    form.genres.data = artist["genres"]
     form.city.data = artist['city']
     form.state.data = artist['state']
     form.phone.data = artist['phone']
@@ -342,14 +508,14 @@ def edit_artist(artist_id):
     return render_template('forms/edit_artist.html', form=form, artist=artist)
 
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
     # artist record with ID <artist_id> using the new attributes
     my_artist = Artist.query.get(artist_id)
     artist = {
         "id": my_artist.id,
         "name": my_artist.name,
-        "genres": [my_artist.genres],
+        "genres": [genre.name for genre in my_artist.genres],
         "city": my_artist.city,
         "state": my_artist.state,
         "phone": my_artist.phone,
@@ -366,9 +532,12 @@ def edit_artist_submission(artist_id):
         my_artist.state = form['state']
         my_artist.phone = form['phone']
         my_artist.facebook_link = form['facebook_link']
-        my_artist.genres = ",".join(request.form.getlist('genres'))
+        my_artist.genres = genres_from_names(request.form.getlist('genres'))
         db.session.add(my_artist)
+        touch_artist_pages(artist_id)
         db.session.commit()
+        page_cache.evict(*artist_page_keys(artist_id))
+        autocomplete.refresh(Artist, [artist_id])
         flash('Artist ' + request.form['name'] + ' was successfully listed!')
     except exc.SQLAlchemyError:
         db.session.rollback()
@@ -376,17 +545,17 @@ def edit_artist_submission(artist_id):
     finally:
         db.session.close()
 
-    return redirect(url_for('show_artist', artist_id=artist_id))
+    return redirect(url_for('.show_artist', artist_id=artist_id))
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
     form = VenueForm()
     desired_venue = Venue.query.get(venue_id)
     venue = {
         "id": desired_venue.id,
         "name": desired_venue.name,
-        "genres": [desired_venue.genres],
+        "genres": [genre.name for genre in desired_venue.genres],
         "address": desired_venue.address,
         "city": desired_venue.city,
         "state": desired_venue.state,
@@ -395,11 +564,15 @@ def edit_venue(venue_id):
         "facebook_link": desired_venue.facebook_link,
         "seeking_talent": desired_venue.seeking_talent,
         "seeking_description": desired_venue.seeking_description,
-        "image_link": desired_venue.image_link
+        "image_link": desired_venue.image_link,
+        "latitude": desired_venue.latitude,
+        "longitude": desired_venue.longitude,
     }
     form.address.data = venue["address"]
+    form.latitude.data = venue["latitude"]
+    form.longitude.data = venue["longitude"]
     form.name.data = venue['name']
-    form.genres.data = [(genre, genre) for genre in venue["genres"][0].split(",")]
+    form.genres.data = venue["genres"]
     form.city.data = venue['city']
     form.state.data = venue['state']
     form.phone.data = venue['phone']
@@ -408,7 +581,7 @@ def edit_venue(venue_id):
     return render_template('forms/edit_venue.html', form=form, venue=venue)
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
     # venue record with ID <venue_id> using the new attributes
     my_venue = Venue.query.get(venue_id)
@@ -420,28 +593,32 @@ def edit_venue_submission(venue_id):
         my_venue.address = form['address']
         my_venue.phone = form['phone']
         my_venue.facebook_link = form['facebook_link']
-        my_venue.genres = ",".join(request.form.getlist('genres'))
+        my_venue.latitude, my_venue.longitude = coordinates(form)
+        my_venue.genres = genres_from_names(request.form.getlist('genres'))
         db.session.add(my_venue)
+        touch_venue_pages(venue_id)
         db.session.commit()
+        page_cache.evict(*venue_page_keys(venue_id))
+        autocomplete.refresh(Venue, [venue_id])
         flash('Venue ' + request.form['name'] + ' was successfully listed!')
     except exc.SQLAlchemyError:
         db.session.rollback()
         flash('An error occurred. Venue ' + my_venue.name + ' could not be listed.')
     finally:
         db.session.close()
-    return redirect(url_for('show_venue', venue_id=venue_id))
+    return redirect(url_for('.show_venue', venue_id=venue_id))
 
 
 #  Create Artist
 #  ----------------------------------------------------------------
 
-@app.route('/artists/create', methods=['GET'])
+@bp.route('/artists/create', methods=['GET'])
 def create_artist_form():
     form = ArtistForm()
     return render_template('forms/new_artist.html', form=form)
 
 
-@app.route('/artists/create', methods=['POST'])
+@bp.route('/artists/create', methods=['POST'])
 def create_artist_submission():
     # called upon submitting the new artist listing form
     my_artist = {}
@@ -450,12 +627,13 @@ def create_artist_submission():
         my_artist = Artist(name=form['name'], city=form['city'], state=form['state'],
                            phone=form['phone'], facebook_link=form['facebook_link'],
                            image_link="https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
-                           seeking_venue=True, genres=",".join(request.form.getlist('genres')))
+                           seeking_venue=True, genres=genres_from_names(request.form.getlist('genres')))
         # on successful db insert, flash success
         db.session.add(my_artist)
         db.session.commit()
+        autocomplete.refresh(Artist, [my_artist.id])
         flash('Artist ' + request.form['name'] + ' was successfully listed!')
-    except SQLAlchemy.exce:
+    except exc.SQLAlchemyError:
         db.session.rollback()
         flash('An error occurred. Artist ' + form['name'] + ' could not be listed.')
     finally:
@@ -466,44 +644,76 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
+@bp.route('/shows')
+@query_budget(2)
+@conditional(shows_validator)
 def shows():
     # displays list of shows at /shows
-    all_shows = Show.query.all()
+    query = db.session.query(Show.id, Show.start_time, Show.venue_id, Venue.name.label('venue_name'),
+                             Show.artist_id, Artist.name.label('artist_name'),
+                             Artist.image_link.label('artist_image_link')) \
+        .join(Venue, Venue.id == Show.venue_id) \
+        .join(Artist, Artist.id == Show.artist_id)
+    try:
+        page = keyset_page(query, (Show.start_time, Show.id),
+                           after=request.args.get('after'), before=request.args.get('before'))
+    except ValueError:
+        abort(400)
     data = []
-    for show in all_shows:
+    for show in page.items:
         data.append({
             "venue_id": show.venue_id,
-            "venue_name": show.venue.name,
+            "venue_name": show.venue_name,
             "artist_id": show.artist_id,
-            "artist_name": show.artist.name,
-            "artist_image_link": show.artist.image_link,
-            "start_time": str(show.start_time)
+            "artist_name": show.artist_name,
+            "artist_image_link": show.artist_image_link,
+            "start_time": show.start_time
         })
-    return render_template('pages/shows.html', shows=data)
+    return render_template('pages/shows.html', shows=data, page=page)
 
 
-@app.route('/shows/create')
+@bp.route('/shows/create')
 def create_shows():
     # renders form. do not touch.
     form = ShowForm()
     return render_template('forms/new_show.html', form=form)
 
 
-@app.route('/shows/create', methods=['POST'])
+@bp.route('/shows/create', methods=['POST'])
 def create_show_submission():
     # called to create new shows in the db, upon submitting new show listing form
     try:
         form = request.form
         artist = Artist.query.get(form['artist_id'])
         venue = Venue.query.get(form['venue_id'])
-        show = Show(start_time=form['start_time'])
+        start_time = dateutil.parser.parse(form['start_time'])
+        if form.get('end_time'):
+            end_time = dateutil.parser.parse(form['end_time'])
+        else:
+            end_time = start_time + DEFAULT_SHOW_DURATION
+        if not start_time < end_time <= start_time + MAX_SHOW_DURATION:
+            raise ValueError('show ends before it starts or lasts too long')
+        show = Show(start_time=start_time, end_time=end_time)
         show.artist = artist
         show.venue = venue
         db.session.add(show)
+        db.session.flush()
+        record_show_added(show)
+        touch(Venue, Venue.id == show.venue_id)
+        touch(Artist, Artist.id == show.artist_id)
         db.session.commit()
+        page_cache.evict('venue:%s' % show.venue_id, 'artist:%s' % show.artist_id)
+        autocomplete.refresh(Venue, [show.venue_id])
+        autocomplete.refresh(Artist, [show.artist_id])
         flash('Show was successfully listed!')
-    except exc.SQLAlchemyError:
+    except exc.IntegrityError as error:
+        db.session.rollback()
+        side = double_booked(error)
+        if side:
+            flash('Show could not be listed: the %s already has a show at that time.' % side)
+        else:
+            flash('An error occurred. Show could not be listed.')
+    except (exc.SQLAlchemyError, ValueError):
         db.session.rollback()
         flash('An error occurred. Show could not be listed.')
     finally:
@@ -511,37 +721,84 @@ def create_show_submission():
     return render_template('pages/home.html')
 
 
-@app.errorhandler(404)
+#  Autocomplete
+#  ----------------------------------------------------------------
+
+@bp.route('/autocomplete')
+def autocomplete_names():
+    # as-you-type suggestions: venues and artists whose name, or a word in it, starts with q
+    kinds = request.args.getlist('type') or None
+    limit = request.args.get('limit', type=int)
+    if (kinds and not set(kinds) <= set(AUTOCOMPLETE_KINDS)) or (limit is not None and limit < 1):
+        abort(400)
+    matches = autocomplete.search(request.args.get('q', ''), limit, kinds)
+    return jsonify({
+        "count": len(matches),
+        "data": matches,
+    })
+
+
+#  Export
+#  ----------------------------------------------------------------
+
+@bp.route('/export/<any(venues, artists, shows):kind>.<any(csv, ndjson):fmt>')
+def export_listings(kind, fmt):
+    # streams the whole table; rows are read through a server-side cursor as the response is sent
+    chunks, mimetype = export(kind, fmt)
+    return Response(stream_with_context(chunks), mimetype=mimetype,
+                    headers={'Content-Disposition': 'attachment; filename={}.{}'.format(kind, fmt)})
+
+
+#  Internal
+#  ----------------------------------------------------------------
+
+def internal(view):
+    @functools.wraps(view)
+    def wrapper(**kwargs):
+        if request.remote_addr not in current_app.config['INTERNAL_ALLOWED_ADDRS']:
+            abort(404)
+        return view(**kwargs)
+    return wrapper
+
+
+@bp.route('/internal/pool')
+@internal
+def internal_pool():
+    # connection pool occupancy and checkout waits for this worker process
+    stats = pool_stats(db.engine)
+    if replicas.replicas:
+        stats['replicas'] = [dict(pool_stats(replica.engine), name=replica.name, healthy=replica.healthy)
+                             for replica in replicas.replicas]
+    return jsonify(stats)
+
+
+@bp.route('/metrics')
+@internal
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@bp.app_errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
-
 # ----------------------------------------------------------------------------#
 # Launch.
 # ----------------------------------------------------------------------------#
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
@@ -0,0 +1,153 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # .br siblings need the optional brotli package
+    brotli = None
+
+'''
+Fingerprinted, precompressed static assets.
+
+build(static_folder) copies every file under static/ into static/dist/ with
+a content hash in its name (css/main.css -> css/main.1a2b3c4d5e6f.css),
+pointing url() references in stylesheets at the hashed names. Compressible
+files get .gz and, with brotli installed, .br siblings. manifest.json maps
+each source path to its hashed one. Earlier builds are left in place, so
+pages rendered before a deploy still load their assets.
+
+With a manifest present, url_for('static', filename='css/main.css') links
+the hashed file. A hashed file never changes, so it is served with a
+year-long immutable Cache-Control, as the .br or .gz sibling when the client
+accepts it; nothing is compressed per request. Without a manifest (a fresh
+checkout), static files are served as usual.
+'''
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+HASH_LENGTH = 12
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# images and woff fonts are compressed formats already
+COMPRESSIBLE = {'.css', '.js', '.map', '.svg', '.ttf', '.otf', '.eot', '.html', '.json', '.txt', '.xml'}
+# in order of preference
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+
+def fingerprinted(path, content):
+    root, ext = os.path.splitext(path)
+    return '%s.%s%s' % (root, hashlib.sha256(content).hexdigest()[:HASH_LENGTH], ext)
+
+
+def compress(encoding, content):
+    if encoding == 'gzip':
+        # mtime=0 keeps builds reproducible
+        return gzip.compress(content, compresslevel=9, mtime=0)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(content, quality=11)
+    return None
+
+
+def rewrite_css_urls(path, content, manifest):
+    directory = posixpath.dirname(path)
+
+    def hashed_url(match):
+        quote, url = match.groups()
+        target, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+        resolved = posixpath.normpath(posixpath.join(directory, target))
+        if not target or ':' in target or target.startswith('/') or resolved not in manifest:
+            return match.group(0)
+        return 'url(%s%s%s%s)' % (quote, posixpath.relpath(manifest[resolved], directory), suffix, quote)
+    return CSS_URL.sub(hashed_url, content.decode('utf-8')).encode('utf-8')
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+
+
+def build(static_folder):
+    # returns the manifest, {source path: hashed path}, relative to static_folder and static_folder/dist
+    dist = os.path.join(static_folder, DIST)
+    sources = []
+    for directory, dirnames, filenames in os.walk(static_folder):
+        dirnames[:] = [name for name in dirnames if os.path.join(directory, name) != dist]
+        sources.extend(os.path.relpath(os.path.join(directory, name), static_folder).replace(os.sep, '/')
+                       for name in filenames if not name.startswith('.'))
+    # stylesheets last, so the files they reference already have hashed names
+    sources.sort(key=lambda path: (path.endswith('.css'), path))
+    manifest = {}
+    for path in sources:
+        with open(os.path.join(static_folder, path), 'rb') as f:
+            content = f.read()
+        if path.endswith('.css'):
+            content = rewrite_css_urls(path, content, manifest)
+        manifest[path] = fingerprinted(path, content)
+        target = os.path.join(dist, manifest[path])
+        write(target, content)
+        if os.path.splitext(path)[1] in COMPRESSIBLE:
+            for encoding, suffix in ENCODINGS:
+                compressed = compress(encoding, content)
+                if compressed is not None and len(compressed) < len(content):
+                    write(target + suffix, compressed)
+    write(os.path.join(dist, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+class StaticAssets:
+    def __init__(self, app=None):
+        self.manifest = {}
+        self.encodings = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.directory = os.path.join(app.static_folder, DIST)
+        try:
+            with open(os.path.join(self.directory, MANIFEST), encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            self.manifest = {}
+        # the precompressed siblings each hashed file has, looked up once rather than per request
+        self.encodings = {
+            hashed: [(encoding, suffix) for encoding, suffix in ENCODINGS
+                     if os.path.exists(os.path.join(self.directory, hashed + suffix))]
+            for hashed in self.manifest.values()
+        }
+        if 'static_assets' not in app.extensions:
+            app.url_defaults(self._hashed_filename)
+            self._static_view = app.view_functions['static']
+            app.view_functions['static'] = self.serve
+        app.extensions['static_assets'] = self
+
+    def _hashed_filename(self, endpoint, values):
+        if endpoint == 'static' and values.get('filename') in self.manifest:
+            values['filename'] = DIST + '/' + self.manifest[values['filename']]
+
+    def serve(self, filename):
+        hashed = filename[len(DIST) + 1:] if filename.startswith(DIST + '/') else None
+        if hashed not in self.encodings:
+            return self._static_view(filename=filename)
+        mimetype = mimetypes.guess_type(hashed)[0] or 'application/octet-stream'
+        for encoding, suffix in self.encodings[hashed]:
+            if request.accept_encodings[encoding]:
+                response = send_from_directory(self.directory, hashed + suffix, mimetype=mimetype,
+                                               max_age=IMMUTABLE_MAX_AGE)
+                response.content_encoding = encoding
+                break
+        else:
+            response = send_from_directory(self.directory, hashed, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+        response.vary.add('Accept-Encoding')
+        response.cache_control.immutable = True
+        return response
+
+
+static_assets = StaticAssets()
@@ -0,0 +1,308 @@
+import heapq
+import threading
+import time
+
+from flask import current_app
+
+from models import db, Venue, Artist
+
+'''
+As-you-type suggestions for venue and artist names.
+
+Each kind has an in-memory prefix trie over its names, matched at the start
+of the name and of every later word ("hop" finds "The Musical Hop"). Every
+node keeps, ready to return, the best AUTOCOMPLETE_RESULTS listings under it
+by upcoming show count, so a lookup walks one node per typed character and
+reads a list. A node is a bucket of listings until it holds more than
+BUCKET_SIZE, and only then gets children; a lookup ending in a bucket checks
+those few listings. Memory is bounded: there are far fewer nodes than
+characters, nodes go at most AUTOCOMPLETE_MAX_PREFIX_LENGTH characters deep
+(longer queries filter the listings in the deepest node), and each trie
+holds at most AUTOCOMPLETE_MAX_ENTRIES listings, those with the most
+upcoming shows when it is loaded.
+
+The tries are loaded at startup (wsgi.py, before workers fork) or on the
+first lookup, which the lookups arriving meanwhile wait for. Write handlers
+call refresh() after they commit, which re-reads the listings they changed.
+Each worker only sees its own writes that way, and upcoming show counts
+change as shows start, so the tries are also rebuilt from the database every
+AUTOCOMPLETE_REFRESH_SECONDS, in a background thread while lookups keep
+using the current ones. Refreshes that arrive during a rebuild are replayed
+into the new tries before they are swapped in.
+'''
+
+KINDS = {'venue': Venue, 'artist': Artist}
+# listings a node holds before it gets children; smaller buckets are filtered per lookup
+BUCKET_SIZE = 16
+
+
+def normalize(name):
+    return ' '.join(name.casefold().split())
+
+
+def word_starts(name):
+    # the normalized name from each word on: the strings a prefix can match
+    words = normalize(name).split(' ')
+    return [' '.join(words[i:]) for i in range(len(words)) if words[i]]
+
+
+class Node:
+    __slots__ = ('children', 'ids', 'top')
+
+    def __init__(self, children=None):
+        # a bucket (children is None) holds every listing under it; a node with children, the ones ending there
+        self.children = children
+        self.ids = set()
+        # the best listings under the node, best first
+        self.top = []
+
+
+class PrefixIndex:
+    def __init__(self, results=10, max_prefix_length=16, max_entries=50000, bucket_size=BUCKET_SIZE):
+        self.results = results
+        self.max_prefix_length = max_prefix_length
+        self.max_entries = max_entries
+        self.bucket_size = bucket_size
+        self.root = Node(children={})
+        # id -> (name, upcoming show count), and id -> its sort key, best first
+        self.entries = {}
+        self.ranks = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def set_entry(self, id, name, count):
+        self.entries[id] = (name, count)
+        self.ranks[id] = (-count, name.casefold(), id)
+
+    def best(self, node):
+        candidates = set(node.ids)
+        for child in (node.children or {}).values():
+            candidates.update(child.top)
+        return heapq.nsmallest(self.results, candidates, key=self.ranks.__getitem__)
+
+    def add(self, id, name, count):
+        # returns False when the index is full
+        if id in self.entries:
+            self.remove(id)
+        if len(self.entries) >= self.max_entries:
+            return False
+        self.set_entry(id, name, count)
+        ranks = self.ranks
+        rank = ranks[id]
+        for start in word_starts(name):
+            node, depth, end = self.root, 0, min(len(start), self.max_prefix_length)
+            while node.children is not None and depth < end:
+                child = node.children.get(start[depth])
+                if child is None:
+                    child = node.children[start[depth]] = Node()
+                node = child
+                depth += 1
+                if len(node.top) < self.results or rank < ranks[node.top[-1]]:
+                    if id not in node.top:
+                        node.top = sorted(node.top + [id], key=ranks.__getitem__)[:self.results]
+            node.ids.add(id)
+            if node.children is None and len(node.ids) > self.bucket_size and depth < self.max_prefix_length:
+                self.split(node, start[:depth])
+        return True
+
+    def split(self, node, prefix):
+        # gives a full bucket one child per next character; it keeps the listings ending at prefix
+        node.children = {}
+        for id in list(node.ids):
+            starts = [start for start in word_starts(self.entries[id][0]) if start.startswith(prefix)]
+            for start in starts:
+                if len(start) > len(prefix):
+                    node.children.setdefault(start[len(prefix)], Node()).ids.add(id)
+            if prefix not in starts:
+                node.ids.discard(id)
+        for char, child in node.children.items():
+            child.top = heapq.nsmallest(self.results, child.ids, key=self.ranks.__getitem__)
+            if len(child.ids) > self.bucket_size and len(prefix) + 1 < self.max_prefix_length:
+                self.split(child, prefix + char)
+
+    def path(self, start):
+        # the existing nodes a word start runs through, root first
+        path = [self.root]
+        for char in start[:self.max_prefix_length]:
+            if path[-1].children is None or char not in path[-1].children:
+                break
+            path.append(path[-1].children[char])
+        return path
+
+    def remove(self, id):
+        if id not in self.entries:
+            return
+        for start in word_starts(self.entries[id][0]):
+            path = self.path(start)
+            # deepest first: emptied nodes are unlinked, and each list is rebuilt from its children's
+            for depth in range(len(path) - 1, 0, -1):
+                node = path[depth]
+                node.ids.discard(id)
+                if not node.ids and not node.children:
+                    del path[depth - 1].children[start[depth - 1]]
+                elif id in node.top:
+                    node.top = self.best(node)
+        del self.entries[id]
+        del self.ranks[id]
+
+    def update(self, id, name, count):
+        if self.entries.get(id, (None,))[0] != name:
+            return self.add(id, name, count)
+        old_count = self.entries[id][1]
+        self.set_entry(id, name, count)
+        rank = self.ranks[id]
+        depths = {}
+        for start in word_starts(name):
+            for depth, node in enumerate(self.path(start)[1:], 1):
+                depths[node] = depth
+        for node in sorted(depths, key=depths.get, reverse=True):
+            if id in node.top and count < old_count:
+                # it may have dropped below a listing that is not in the list
+                node.top = self.best(node)
+            elif id in node.top or len(node.top) < self.results or rank < self.ranks[node.top[-1]]:
+                node.top = sorted(set(node.top) | {id}, key=self.ranks.__getitem__)[:self.results]
+        return True
+
+    def search(self, prefix, limit):
+        # [(id, name, count)] for up to limit (at most results) listings matching prefix, most upcoming shows first
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        limit = min(limit, self.results)
+        path = self.path(prefix)
+        node = path[-1]
+        if len(path) - 1 == len(prefix):
+            ids = node.top[:limit]
+        elif node.children is not None:
+            # no listing continues the prefix
+            return []
+        else:
+            # a bucket, or past max_prefix_length: check the listings in it
+            matches = (id for id in node.ids
+                       if any(start.startswith(prefix) for start in word_starts(self.entries[id][0])))
+            ids = heapq.nsmallest(limit, matches, key=self.ranks.__getitem__)
+        return [(id,) + self.entries[id] for id in ids]
+
+
+class Autocomplete:
+    def __init__(self, app=None):
+        # guards indexes, loaded_at and _pending; held only for in-memory work, never across a query
+        self._lock = threading.Lock()
+        # one load at a time
+        self._load_lock = threading.Lock()
+        self.indexes = {}
+        self.loaded_at = None
+        # kind -> ids changed while a load runs, replayed into its tries before they are swapped in
+        self._pending = None
+        self._reloading = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.results = app.config.get('AUTOCOMPLETE_RESULTS', 10)
+        self.max_prefix_length = app.config.get('AUTOCOMPLETE_MAX_PREFIX_LENGTH', 16)
+        self.max_entries = app.config.get('AUTOCOMPLETE_MAX_ENTRIES', 50000)
+        self.refresh_seconds = app.config.get('AUTOCOMPLETE_REFRESH_SECONDS', 300)
+        with self._lock:
+            self.indexes = {}
+            self.loaded_at = None
+        app.extensions['autocomplete'] = self
+
+    def load(self):
+        # builds the tries from the database, then swaps them in; lookups meanwhile use the old ones
+        with self._load_lock:
+            self._load()
+
+    def _load(self):
+        with self._lock:
+            self._pending = {kind: set() for kind in KINDS}
+        try:
+            indexes = {}
+            for kind, model in KINDS.items():
+                index = indexes[kind] = PrefixIndex(self.results, self.max_prefix_length, self.max_entries)
+                rows = db.session.query(model.id, model.name, model.upcoming_shows_count) \
+                    .order_by(model.upcoming_shows_count.desc(), model.id).limit(self.max_entries).all()
+                # best first, so the lists of the best per node only ever grow at the end
+                for id, name, count in sorted(rows, key=lambda row: (-row[2], row[1].casefold(), row[0])):
+                    index.add(id, name, count)
+            while True:
+                # the build may have read some listings before a write handler committed changes to them
+                with self._lock:
+                    pending, self._pending = self._pending, {kind: set() for kind in KINDS}
+                    if not any(pending.values()):
+                        self.indexes = indexes
+                        self.loaded_at = time.monotonic()
+                        return
+                for kind, ids in pending.items():
+                    if ids:
+                        self._apply(indexes[kind], KINDS[kind], ids)
+        finally:
+            with self._lock:
+                self._pending = None
+
+    def refresh(self, model, ids):
+        # call after committing changes to these venues or artists, including deletes
+        if not ids:
+            return
+        kind = next(kind for kind, kind_model in KINDS.items() if kind_model is model)
+        with self._lock:
+            if self._pending is not None:
+                # a load is running and may have read these before the commit
+                self._pending[kind].update(ids)
+            index = self.indexes.get(kind)
+        if index is not None:
+            self._apply(index, model, ids)
+
+    def _apply(self, index, model, ids):
+        rows = db.session.query(model.id, model.name, model.upcoming_shows_count).filter(model.id.in_(ids)).all()
+        with self._lock:
+            for id, name, count in rows:
+                index.update(id, name, count)
+            for id in set(ids) - {row.id for row in rows}:
+                index.remove(id)
+
+    def search(self, prefix, limit=None, kinds=None):
+        # [{"type", "id", "name", "num_upcoming_shows"}], most upcoming shows first
+        self._load_if_stale()
+        limit = min(limit or self.results, self.results)
+        with self._lock:
+            matches = [(count, kind, id, name) for kind in kinds or KINDS if kind in self.indexes
+                       for id, name, count in self.indexes[kind].search(prefix, limit)]
+        matches.sort(key=lambda match: (-match[0], match[3].casefold(), match[1], match[2]))
+        return [{
+            "type": kind,
+            "id": id,
+            "name": name,
+            "num_upcoming_shows": count,
+        } for count, kind, id, name in matches[:limit]]
+
+    def _load_if_stale(self):
+        if self.loaded_at is None:
+            # nothing to answer from yet: the first lookups wait for one load
+            with self._load_lock:
+                if self.loaded_at is None:
+                    self._load()
+            return
+        with self._lock:
+            stale = not self._reloading and self.refresh_seconds \
+                and time.monotonic() - self.loaded_at >= self.refresh_seconds
+            if stale:
+                self._reloading = True
+        if stale:
+            # reloaded off the request path; lookups keep using the current tries until it is done
+            threading.Thread(target=self._reload, args=(current_app._get_current_object(),), daemon=True).start()
+
+    def _reload(self, app):
+        try:
+            with app.app_context():
+                self.load()
+        except Exception:
+            # the old tries keep serving, and the next lookup tries again
+            app.logger.exception('Reloading the autocomplete tries failed.')
+        finally:
+            with self._lock:
+                self._reloading = False
+
+
+autocomplete = Autocomplete()
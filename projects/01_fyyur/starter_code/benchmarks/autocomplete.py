@@ -0,0 +1,88 @@
+"""Autocomplete lookup time and index size against the full-text name search, as JSON.
+
+Run against a seeded database, from starter_code/ (see benchmarks/routes.py):
+
+    export DATABASE_URL=sqlite:///bench.sqlite FLASK_APP=app.py
+    python benchmarks/autocomplete.py --output autocomplete.json
+
+Loads the prefix tries the way a worker does at startup, reporting the load
+time and the memory they hold, then times lookups for the first one to five
+characters of a sample of names, in process (autocomplete.search) and
+through /autocomplete with the test client, next to search_by_name, which
+backs the search forms, for the same prefixes.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db, Venue, Artist  # noqa: E402
+from autocomplete import autocomplete  # noqa: E402
+from search import search_by_name  # noqa: E402
+
+app = create_app()
+
+
+def median_us(func, prefixes):
+    timings = []
+    for prefix in prefixes:
+        started = time.perf_counter()
+        func(prefix)
+        timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1e6, 1)
+
+
+def run(samples, seed):
+    client = app.test_client()
+    with app.app_context():
+        started = time.perf_counter()
+        autocomplete.load()
+        load_ms = (time.perf_counter() - started) * 1000
+        # again, traced, for the memory the tries hold once loaded
+        autocomplete.init_app(app)
+        tracemalloc.start()
+        autocomplete.load()
+        index_mb = tracemalloc.get_traced_memory()[0] / 1e6
+        tracemalloc.stop()
+        names = [name for model in (Venue, Artist) for (name,) in db.session.query(model.name)]
+        random.Random(seed).shuffle(names)
+        report = {
+            'names': {kind: len(index) for kind, index in autocomplete.indexes.items()},
+            'load_ms': round(load_ms, 1),
+            'index_mb': round(index_mb, 1),
+            'prefixes': {},
+        }
+        for length in range(1, 6):
+            prefixes = [name[:length] for name in names[:samples] if len(name) >= length]
+            report['prefixes'][length] = {
+                'search_us': median_us(autocomplete.search, prefixes),
+                'endpoint_us': median_us(lambda prefix: client.get('/autocomplete', query_string={'q': prefix}),
+                                         prefixes),
+                'search_by_name_us': median_us(lambda prefix: search_by_name(Venue, prefix), prefixes),
+            }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--samples', type=int, default=500, help='names whose prefixes are looked up')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+    app.logger.disabled = True
+    report = json.dumps(run(args.samples, args.seed), indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
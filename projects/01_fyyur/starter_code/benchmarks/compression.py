@@ -0,0 +1,117 @@
+"""CPU time against bytes saved for each gzip level and brotli quality, as JSON.
+
+Run against a seeded database, from starter_code/ (see benchmarks/routes.py):
+
+    export DATABASE_URL=sqlite:///bench.sqlite FLASK_APP=app.py
+    python benchmarks/compression.py --output compression.json
+
+Bodies are fetched uncompressed through the test client: the listing and
+detail pages, the nearby venues JSON and the first megabyte of the shows
+export. Other responses, such as the trivia API's /questions JSON, can be
+added with --body questions.json:application/json after saving them with
+curl. Every body is compressed at every level, and the median time per
+compression is reported with the compressed size, so levels can be chosen
+per content type in COMPRESSION_LEVELS.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db, Venue, Artist  # noqa: E402
+from cache import page_cache  # noqa: E402
+from compression import ENCODINGS  # noqa: E402
+
+app = create_app()
+
+LEVELS = {'gzip': range(1, 10), 'br': range(0, 12)}
+EXPORT_BYTES = 1 << 20
+
+
+def app_bodies():
+    # (name, mimetype, body) for representative responses
+    client = app.test_client()
+    with app.app_context():
+        venue_id = db.session.query(db.func.min(Venue.id)).scalar()
+        artist_id = db.session.query(db.func.min(Artist.id)).scalar()
+        venue = Venue.query.get(venue_id) if venue_id else None
+        lat, lng = (venue.latitude, venue.longitude) if venue is not None and venue.latitude is not None else (0, 0)
+    paths = ['/venues', '/artists', '/shows', '/venues/%s' % venue_id, '/artists/%s' % artist_id,
+             '/venues/nearby?lat=%s&lng=%s&radius=50' % (lat, lng)]
+    for path in paths:
+        response = client.get(path)
+        if response.status_code == 200:
+            yield path, response.mimetype, response.get_data()
+    response = client.get('/export/shows.csv')
+    body = b''
+    for chunk in response.response:
+        body += chunk
+        if len(body) >= EXPORT_BYTES:
+            break
+    response.close()
+    yield '/export/shows.csv (first 1MB)', response.mimetype, body[:EXPORT_BYTES]
+
+
+def measure(body, encoding, level, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        compressor = ENCODINGS[encoding](level)
+        size = len(compressor.compress(body)) + len(compressor.finish())
+        timings.append(time.perf_counter() - started)
+    ms = statistics.median(timings) * 1000
+    return {
+        'level': level,
+        'bytes': size,
+        'ratio': round(len(body) / size, 2),
+        'ms': round(ms, 3),
+        'mb_per_s': round(len(body) / 1e6 / (ms / 1000), 1) if ms else None,
+    }
+
+
+def run(extra_bodies, repeat):
+    app.config['PAGE_CACHE_BACKEND'] = None
+    page_cache.init_app(app)
+    report = []
+    bodies = list(app_bodies()) + extra_bodies
+    for name, mimetype, body in bodies:
+        report.append({
+            'body': name,
+            'mimetype': mimetype,
+            'bytes': len(body),
+            'encodings': {encoding: [measure(body, encoding, level, repeat) for level in LEVELS[encoding]]
+                          for encoding in ENCODINGS},
+        })
+    return report
+
+
+def read_body(argument):
+    path, _, mimetype = argument.partition(':')
+    with open(path, 'rb') as f:
+        return path, mimetype or 'application/octet-stream', f.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20, help='compressions per body and level')
+    parser.add_argument('--body', action='append', default=[], metavar='PATH[:MIMETYPE]',
+                        help='also measure this file, e.g. a saved /questions response')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+    app.logger.disabled = True
+    if 'br' not in ENCODINGS:
+        print('The brotli package is not installed; measuring gzip only.', file=sys.stderr)
+    report = json.dumps(run([read_body(body) for body in args.body], args.repeat), indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
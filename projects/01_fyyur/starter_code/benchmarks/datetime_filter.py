@@ -0,0 +1,49 @@
+"""Per-row cost of the `datetime` Jinja filter, before and after precompiling patterns.
+
+Run from starter_code/:  python benchmarks/datetime_filter.py [rows]
+"""
+import datetime
+import os
+import sys
+import timeit
+
+import babel.dates
+import dateutil.parser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, format_datetime  # noqa: E402
+
+app = create_app()
+
+
+def format_datetime_from_string(value, s_format='medium'):
+    # the filter as it was: every row arrives as str(start_time) and is parsed back
+    date = dateutil.parser.parse(value)
+    if s_format == 'full':
+        s_format = "EEEE MMMM, d, y 'at' h:mma"
+    elif s_format == 'medium':
+        s_format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, s_format, locale='en')
+
+
+def per_row_us(func, values, repeat=5):
+    best = min(timeit.repeat(lambda: [func(value, 'full') for value in values], number=1, repeat=repeat))
+    return best / len(values) * 1e6
+
+
+def main(rows=2000):
+    start = datetime.datetime(2026, 1, 1, 20, 0)
+    times = [start + datetime.timedelta(hours=i) for i in range(rows)]
+    strings = [str(value) for value in times]
+    with app.app_context():
+        before = per_row_us(format_datetime_from_string, strings)
+        after = per_row_us(format_datetime, times)
+    print('rows: {}'.format(rows))
+    print('str -> parse -> format: {:8.2f} us/row'.format(before))
+    print('datetime -> format:     {:8.2f} us/row'.format(after))
+    print('speedup:                {:8.2f}x'.format(before / after))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
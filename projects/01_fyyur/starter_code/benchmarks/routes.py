@@ -0,0 +1,156 @@
+"""Latency percentiles and queries per request for every Fyyur route, as JSON.
+
+Seed a database first, then point both commands at it, from starter_code/:
+
+    export DATABASE_URL=sqlite:///bench.sqlite FLASK_APP=app.py
+    flask fyyur seed --venues 50000 --artists 200000 --shows 5000000 --seed 1 --create-schema
+    python benchmarks/routes.py --requests 50 --output before.json
+
+Every rule in the app's url_map is driven through the test client, with
+venue and artist ids sampled from the database. Routes that write (create,
+edit, delete) are listed under "skipped" so runs stay repeatable. The page
+cache is off unless --page-cache is given, so the numbers measure the query
+and render path.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import url_for  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app, db, Venue, Artist, Show  # noqa: E402
+from cache import page_cache  # noqa: E402
+
+app = create_app()
+
+READ_ONLY_POSTS = {'fyyur.search_venues': 'music', 'fyyur.search_artists': 'band'}
+ARGUMENTS = {'kind': ['venues', 'artists', 'shows'], 'fmt': ['csv', 'ndjson']}
+# query strings for routes that need them; the seeder scatters venues around Manhattan
+QUERY_ARGS = {'fyyur.venues_nearby': {'lat': 40.71, 'lng': -74.01, 'radius': 10}}
+# full-table exports are timed once per combination, not once per request
+SINGLE_SHOT = {'fyyur.export_listings'}
+
+
+def percentile(values, p):
+    # nearest-rank percentile of a sorted list
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+def commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def sample_ids(model, count, rng):
+    low, high = db.session.query(db.func.min(model.id), db.func.max(model.id)).one()
+    if low is None:
+        return []
+    return [rng.randint(low, high) for _ in range(count)]
+
+
+def requests_for(rule, count, ids, rng):
+    # yields (method, url, form data) for one url_map rule
+    methods = rule.methods & {'GET', 'POST'}
+    if 'POST' in methods and rule.endpoint in READ_ONLY_POSTS:
+        for page in range(count):
+            yield 'POST', url_for(rule.endpoint), {'search_term': READ_ONLY_POSTS[rule.endpoint],
+                                                   'page': 1 + page % 3}
+        return
+    if 'GET' not in methods:
+        return
+    if rule.endpoint in SINGLE_SHOT:
+        for kind in ARGUMENTS['kind']:
+            for fmt in ARGUMENTS['fmt']:
+                yield 'GET', url_for(rule.endpoint, kind=kind, fmt=fmt), None
+        return
+    for i in range(count):
+        values = {argument: ids[argument][i] if argument in ids else rng.choice(ARGUMENTS[argument])
+                  for argument in rule.arguments}
+        values.update(QUERY_ARGS.get(rule.endpoint, {}))
+        yield 'GET', url_for(rule.endpoint, **values), None
+
+
+def run(count, seed, use_page_cache):
+    rng = random.Random(seed)
+    if not use_page_cache:
+        app.config['PAGE_CACHE_BACKEND'] = None
+        page_cache.init_app(app)
+    statements = []
+    results, skipped = {}, []
+    with app.test_request_context():
+        ids = {'venue_id': sample_ids(Venue, count, rng), 'artist_id': sample_ids(Artist, count, rng)}
+        rows = {model.__tablename__: db.session.query(db.func.count(model.id)).scalar()
+                for model in (Venue, Artist, Show)}
+        dialect = db.engine.dialect.name
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(1))
+        rules = sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule)
+        plans = []
+        for rule in rules:
+            if rule.endpoint == 'static':
+                continue
+            if any(argument in ids and not ids[argument] for argument in rule.arguments):
+                skipped.append(rule.rule)
+                continue
+            plan = list(requests_for(rule, count, ids, rng))
+            if plan:
+                plans.append(('%s %s' % (plan[0][0], rule.rule), plan))
+            else:
+                skipped.append('%s %s' % ('/'.join(sorted(rule.methods - {'HEAD', 'OPTIONS'})), rule.rule))
+        db.session.remove()
+    client = app.test_client()
+    for name, plan in plans:
+        method, url, data = plan[0]
+        client.open(url, method=method, data=data)  # warm up templates and caches
+        timings, queries, statuses = [], [], Counter()
+        for method, url, data in plan:
+            del statements[:]
+            started = time.perf_counter()
+            response = client.open(url, method=method, data=data)
+            response.get_data()
+            timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(statements))
+            statuses[response.status_code] += 1
+        timings.sort()
+        results[name] = {
+            'requests': len(timings),
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'queries_per_request': round(sum(queries) / len(queries), 2),
+            'max_queries': max(queries),
+            'status': dict(statuses),
+        }
+    return {'commit': commit(), 'database': dialect, 'rows': rows, 'page_cache': use_page_cache,
+            'routes': results, 'skipped': skipped}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=50, help='requests per route')
+    parser.add_argument('--seed', type=int, default=1, help='seed for sampling ids')
+    parser.add_argument('--page-cache', action='store_true', help='keep the configured page cache on')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+    app.logger.disabled = True
+    report = json.dumps(run(args.requests, args.seed, args.page_cache), indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Import time and time to first request for a fresh Fyyur worker, as JSON.
+
+From starter_code/, optionally against a seeded database:
+
+    export DATABASE_URL=sqlite:///bench.sqlite
+    python benchmarks/startup.py --runs 5 --output startup.json
+
+Each run starts a new Python process, imports the app and sends the first
+request to each page, the way a worker does after a deploy. Runs are made
+without a template bytecode cache, with an empty cache directory and with
+one filled by `flask fyyur precompile`, and the medians are reported. A
+small SQLite database is seeded when DATABASE_URL is not set.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+STARTER_CODE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATHS = ['/', '/venues', '/artists', '/shows', '/venues/1', '/artists/1',
+         '/venues/create', '/artists/create', '/shows/create', '/venues/1/edit', '/artists/1/edit']
+
+
+def child():
+    # runs in the measured process: prints import and first request timings as JSON
+    started = time.perf_counter()
+    sys.path.insert(0, STARTER_CODE)
+    from app import create_app
+    app = create_app()
+    imported = time.perf_counter()
+    app.logger.disabled = True
+    client = app.test_client()
+    requests = {}
+    for path in PATHS:
+        request_started = time.perf_counter()
+        client.get(path).close()
+        requests[path] = (time.perf_counter() - request_started) * 1000
+    print(json.dumps({'import_ms': (imported - started) * 1000, 'first_request_ms': requests}))
+
+
+def run(env):
+    output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--child'],
+                                     cwd=STARTER_CODE, env=env, stderr=subprocess.DEVNULL)
+    return json.loads(output)
+
+
+def summarize(runs):
+    medians = {path: statistics.median(run['first_request_ms'][path] for run in runs) for path in PATHS}
+    import_ms = statistics.median(run['import_ms'] for run in runs)
+    return {
+        'import_ms': round(import_ms, 1),
+        'time_to_first_request_ms': round(import_ms + medians[PATHS[0]], 1),
+        'all_pages_first_hit_ms': round(sum(medians.values()), 1),
+        'first_request_ms': {path: round(ms, 2) for path, ms in medians.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='fresh processes per mode')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, FLASK_APP='app.py')
+        if 'DATABASE_URL' not in env:
+            env['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmp, 'startup.sqlite')
+            subprocess.check_call([sys.executable, '-m', 'flask', 'fyyur', 'seed', '--venues', '20', '--artists',
+                                   '20', '--shows', '200', '--seed', '1', '--create-schema'],
+                                  cwd=STARTER_CODE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        report = {'runs': args.runs}
+        report['no_cache'] = summarize([run(dict(env, JINJA_BYTECODE_CACHE_DIR='')) for _ in range(args.runs)])
+        cold = []
+        for i in range(args.runs):
+            cold.append(run(dict(env, JINJA_BYTECODE_CACHE_DIR=os.path.join(tmp, 'cold-%d' % i))))
+        report['empty_cache'] = summarize(cold)
+        warm = dict(env, JINJA_BYTECODE_CACHE_DIR=os.path.join(tmp, 'warm'))
+        subprocess.check_call([sys.executable, '-m', 'flask', 'fyyur', 'precompile'],
+                              cwd=STARTER_CODE, env=warm, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        report['precompiled_cache'] = summarize([run(warm) for _ in range(args.runs)])
+
+    report = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""Boot time and memory per worker for a prefork server, with and without preloading, as JSON.
+
+From starter_code/, optionally against a seeded database (Linux only, memory
+is read from /proc/<pid>/smaps_rollup):
+
+    export DATABASE_URL=sqlite:///bench.sqlite
+    python benchmarks/workers.py --workers 4 --output workers.json
+
+Each mode runs in a new Python process that acts as the server master and
+forks --workers workers, the way gunicorn does:
+
+    lazy      the workers import and build the app after the fork
+              (gunicorn without --preload)
+    preload   the master builds the app once and the workers fork from it
+              (gunicorn --preload wsgi:app)
+
+Every worker serves --requests requests over the pages, then reports its
+resident (RSS), proportional (PSS: shared pages split between the processes
+sharing them) and private (USS) memory. boot_ms is the time from the master
+starting until every worker is ready to serve. A small SQLite database is
+seeded when DATABASE_URL is not set.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+STARTER_CODE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATHS = ['/', '/venues', '/artists', '/shows', '/venues/1', '/artists/1', '/venues/create', '/venues/1/edit']
+MODES = ['lazy', 'preload']
+
+
+def memory_mb(pid='self'):
+    # {'rss', 'pss', 'uss'} in MB for a process
+    fields = {}
+    with open('/proc/%s/smaps_rollup' % pid) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'rss': round(fields['Rss'] / 1024, 1),
+        'pss': round(fields['Pss'] / 1024, 1),
+        'uss': round((fields['Private_Clean'] + fields['Private_Dirty']) / 1024, 1),
+    }
+
+
+def build_app():
+    sys.path.insert(0, STARTER_CODE)
+    from app import create_app
+    app = create_app()
+    app.logger.disabled = True
+    return app
+
+
+def worker(app, started, requests, ready, done):
+    if app is None:
+        app = build_app()
+    ready.write(json.dumps({'ready_ms': (time.perf_counter() - started) * 1000}) + '\n')
+    ready.flush()
+    client = app.test_client()
+    for i in range(requests):
+        client.get(PATHS[i % len(PATHS)]).close()
+    # wait for the master, so every worker is measured while all of them are alive
+    done.read(1)
+    ready.write(json.dumps(memory_mb()) + '\n')
+    ready.flush()
+
+
+def master(mode, workers, requests):
+    # runs in the measured process: forks the workers and prints the mode's results as JSON
+    started = time.perf_counter()
+    app = build_app() if mode == 'preload' else None
+    children = []
+    for _ in range(workers):
+        ready_r, ready_w = os.pipe()
+        done_r, done_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_r)
+            os.close(done_w)
+            try:
+                worker(app, started, requests, os.fdopen(ready_w, 'w'), os.fdopen(done_r))
+            finally:
+                os._exit(0)
+        os.close(ready_w)
+        os.close(done_r)
+        children.append((pid, os.fdopen(ready_r), os.fdopen(done_w, 'w')))
+    ready_ms = [json.loads(ready.readline())['ready_ms'] for _, ready, _ in children]
+    boot_ms = max(ready_ms)
+    for _, _, done in children:
+        done.write('x')
+        done.flush()
+    memory = [json.loads(ready.readline()) for _, ready, _ in children]
+    master_memory = memory_mb()
+    for pid, ready, done in children:
+        os.waitpid(pid, 0)
+        ready.close()
+        done.close()
+    print(json.dumps({
+        'boot_ms': round(boot_ms, 1),
+        'worker_ready_ms': round(statistics.median(ready_ms), 1),
+        'master_mb': master_memory,
+        'worker_mb': {key: statistics.median(m[key] for m in memory) for key in ('rss', 'pss', 'uss')},
+        'total_pss_mb': round(master_memory['pss'] + sum(m['pss'] for m in memory), 1),
+    }))
+
+
+def run(mode, workers, requests, env):
+    output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--child', mode,
+                                      '--workers', str(workers), '--requests', str(requests)],
+                                     cwd=STARTER_CODE, env=env, stderr=subprocess.DEVNULL)
+    return json.loads(output)
+
+
+def summarize(runs):
+    # medians over the runs of one mode
+    return {
+        'boot_ms': statistics.median(run['boot_ms'] for run in runs),
+        'worker_ready_ms': statistics.median(run['worker_ready_ms'] for run in runs),
+        'master_mb': {key: statistics.median(run['master_mb'][key] for run in runs) for key in ('rss', 'pss', 'uss')},
+        'worker_mb': {key: statistics.median(run['worker_mb'][key] for run in runs) for key in ('rss', 'pss', 'uss')},
+        'total_pss_mb': statistics.median(run['total_pss_mb'] for run in runs),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4, help='workers forked per mode')
+    parser.add_argument('--requests', type=int, default=200, help='requests served by each worker')
+    parser.add_argument('--runs', type=int, default=3, help='fresh masters per mode')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return master(args.child, args.workers, args.requests)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, FLASK_APP='app.py', SECRET_KEY='benchmark', ERROR_LOG='')
+        if 'DATABASE_URL' not in env:
+            env['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmp, 'workers.sqlite')
+            subprocess.check_call([sys.executable, '-m', 'flask', 'fyyur', 'seed', '--venues', '20', '--artists',
+                                   '20', '--shows', '200', '--seed', '1', '--create-schema'],
+                                  cwd=STARTER_CODE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        report = {'workers': args.workers, 'requests_per_worker': args.requests, 'runs': args.runs}
+        for mode in MODES:
+            report[mode] = summarize([run(mode, args.workers, args.requests, env) for _ in range(args.runs)])
+
+    report = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+import functools
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+
+from flask import request, session
+
+'''
+Rendered-page cache.
+
+PageCache stores the HTML a view returns under a key derived from its URL
+arguments. Write handlers evict exactly the keys they affect; the TTL bounds
+how long a page can lag behind changes nothing evicts, such as an upcoming
+show becoming a past one.
+
+Backends implement get(key), set(key, value), delete(keys) and clear().
+'''
+
+
+class LRUCache:
+    """In-process cache bounded by entry count and age. Only consistent for a single worker."""
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCache:
+    """Cache in a local SQLite file, shared by every worker on the host."""
+
+    def __init__(self, path, max_entries=10000, ttl=300):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS page_cache '
+                         '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_page_cache_expires ON page_cache (expires)')
+
+    @contextmanager
+    def _connect(self):
+        with closing(sqlite3.connect(self.path, timeout=5)) as conn, conn:
+            yield conn
+
+    def get(self, key):
+        with self._connect() as conn:
+            row = conn.execute('SELECT value FROM page_cache WHERE key = ? AND expires >= ?',
+                               (key, time.time())).fetchone()
+        return row and row[0]
+
+    def set(self, key, value):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO page_cache (key, value, expires) VALUES (?, ?, ?)',
+                         (key, value, now + self.ttl))
+            conn.execute('DELETE FROM page_cache WHERE expires < ?', (now,))
+            # drop the entries closest to expiry once over the size bound
+            conn.execute('DELETE FROM page_cache WHERE key IN (SELECT key FROM page_cache '
+                         'ORDER BY expires DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+
+    def delete(self, keys):
+        with self._connect() as conn:
+            conn.executemany('DELETE FROM page_cache WHERE key = ?', [(key,) for key in keys])
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM page_cache')
+
+
+def make_backend(config):
+    backend = config.get('PAGE_CACHE_BACKEND')
+    max_entries = config.get('PAGE_CACHE_MAX_ENTRIES', 1024)
+    ttl = config.get('PAGE_CACHE_TTL', 300)
+    if not backend:
+        return None
+    if backend == 'memory':
+        return LRUCache(max_entries, ttl)
+    if backend == 'sqlite':
+        return SQLiteCache(config['PAGE_CACHE_PATH'], max_entries, ttl)
+    raise ValueError('unknown PAGE_CACHE_BACKEND %r' % backend)
+
+
+class PageCache:
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.backend = make_backend(app.config)
+        app.extensions['page_cache'] = self
+
+    def cached(self, key_format):
+        # key_format is formatted with the view's URL arguments, e.g. 'venue:{venue_id}'
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(**kwargs):
+                # pages carrying flashed messages are per-user, never cache them
+                if self.backend is None or request.method != 'GET' or session.get('_flashes'):
+                    return view(**kwargs)
+                key = key_format.format(**kwargs)
+                page = self.backend.get(key)
+                if page is None:
+                    page = view(**kwargs)
+                    if isinstance(page, str):
+                        self.backend.set(key, page)
+                return page
+            return wrapper
+        return decorator
+
+    def evict(self, *keys):
+        if self.backend is not None and keys:
+            self.backend.delete(keys)
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+
+page_cache = PageCache()
@@ -0,0 +1,93 @@
+import json
+import os
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+import assets
+from counters import reconcile_upcoming_shows
+from exporter import export, FORMATS, QUERIES
+from importer import import_venues, import_artists, import_shows, read_rows, BATCH_SIZE
+from models import db
+from seeder import seed
+from templating import precompile
+
+fyyur_cli = AppGroup('fyyur', help='Fyyur maintenance commands.')
+
+IMPORTERS = {
+    'venues': import_venues,
+    'artists': import_artists,
+    'shows': import_shows,
+}
+
+
+@fyyur_cli.command('reconcile-counters')
+def reconcile_counters():
+    """Recompute upcoming show counters; run periodically (e.g. hourly from cron)."""
+    fixed = reconcile_upcoming_shows()
+    click.echo('Corrected {} upcoming show counters.'.format(fixed))
+
+
+@fyyur_cli.command('import')
+@click.argument('kind', type=click.Choice(sorted(IMPORTERS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=BATCH_SIZE, show_default=True, help='Rows per insert transaction.')
+@click.option('--rejects', type=click.Path(dir_okay=False), help='Write rejected rows to this JSON Lines file.')
+def import_file(kind, path, batch_size, rejects):
+    """Bulk import venues, artists or shows from a CSV or JSON Lines (.jsonl) file."""
+    report = IMPORTERS[kind](read_rows(path), batch_size)
+    click.echo('Imported {} {}, rejected {} in {:.2f}s ({:.0f} rows/s).'.format(
+        report.inserted, kind, len(report.rejected), report.elapsed, report.rows_per_second))
+    for rejected in report.rejected[:10]:
+        click.echo('  line {line}: {errors}'.format(**rejected), err=True)
+    if rejects:
+        with open(rejects, 'w', encoding='utf-8') as f:
+            for rejected in report.rejected:
+                f.write(json.dumps(rejected) + '\n')
+
+
+@fyyur_cli.command('export')
+@click.argument('kind', type=click.Choice(sorted(QUERIES)))
+@click.option('--format', 'fmt', type=click.Choice(sorted(FORMATS)), default='csv', show_default=True)
+@click.option('--output', '-o', type=click.File('w', encoding='utf-8'), default='-', help='Defaults to stdout.')
+def export_file(kind, fmt, output):
+    """Stream every venue, artist or show as CSV or NDJSON."""
+    chunks, _ = export(kind, fmt)
+    for chunk in chunks:
+        output.write(chunk)
+
+
+@fyyur_cli.command('seed')
+@click.option('--venues', default=1000, show_default=True)
+@click.option('--artists', default=4000, show_default=True)
+@click.option('--shows', default=100000, show_default=True)
+@click.option('--seed', 'random_seed', type=int, help='Seed the generator for a reproducible data set.')
+@click.option('--batch-size', default=10000, show_default=True, help='Rows per insert transaction.')
+@click.option('--create-schema', is_flag=True, help='Create missing tables first (for a fresh SQLite file).')
+def seed_data(venues, artists, shows, random_seed, batch_size, create_schema):
+    """Add synthetic venues, artists and shows to the configured database."""
+    if create_schema:
+        db.create_all()
+    seed(venues, artists, shows, random_seed, batch_size, log=click.echo)
+
+
+@fyyur_cli.command('build-assets')
+def build_assets():
+    """Fingerprint and precompress static/ into static/dist/ for long-lived browser caching."""
+    manifest = assets.build(current_app.static_folder)
+    assets.static_assets.init_app(current_app)
+    click.echo('Built {} assets into {}.'.format(len(manifest), os.path.join(current_app.static_folder, assets.DIST)))
+    if assets.brotli is None:
+        click.echo('The brotli package is not installed; only .gz files were written.', err=True)
+
+
+@fyyur_cli.command('precompile')
+def precompile_templates():
+    """Compile every template into the Jinja bytecode cache, so new workers skip compiling."""
+    timings = precompile(current_app)
+    directory = current_app.config.get('JINJA_BYTECODE_CACHE_DIR')
+    click.echo('Compiled {} templates in {:.0f}ms{}.'.format(
+        len(timings), sum(timings.values()), ' into ' + directory if directory else ''))
+    if not directory:
+        click.echo('JINJA_BYTECODE_CACHE_DIR is not set; nothing was saved.', err=True)
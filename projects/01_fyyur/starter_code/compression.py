@@ -0,0 +1,166 @@
+import zlib
+
+from werkzeug.http import parse_accept_header
+from werkzeug.wsgi import ClosingIterator
+
+try:
+    import brotli
+except ImportError:  # without the optional brotli package, responses are gzipped
+    brotli = None
+
+'''
+Response compression middleware.
+
+    app.wsgi_app = CompressionMiddleware(app.wsgi_app, {'text/html': (6, 5)})
+
+compresses responses whose mimetype appears in the levels mapping, at the
+given gzip level (1-9) or brotli quality (0-11), whichever the client's
+Accept-Encoding prefers (brotli on a tie, when installed). Bodies under
+min_size bytes, HEAD requests, statuses without a body, responses that
+already carry a Content-Encoding and Cache-Control: no-transform pass
+through untouched.
+
+Buffered bodies are compressed in one go and keep a Content-Length.
+Streamed bodies (no Content-Length) are read until min_size bytes have
+arrived; if they end sooner they go out as they are, otherwise each chunk
+is compressed and flushed as it comes, so the client still receives rows
+while the server produces them.
+'''
+
+MIN_SIZE = 1024
+NO_BODY_STATUSES = ('1', '204', '304')
+
+
+class GzipCompressor:
+    def __init__(self, level):
+        # wbits=31: zlib deflate with a gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data, flush=False):
+        return self._compressor.compress(data) + (self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else b'')
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliCompressor:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data, flush=False):
+        return self._compressor.process(data) + (self._compressor.flush() if flush else b'')
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+# in order of preference
+ENCODINGS = {'br': BrotliCompressor, 'gzip': GzipCompressor} if brotli is not None else {'gzip': GzipCompressor}
+
+
+def negotiate(accept_encoding):
+    # the preferred encoding the client accepts, or None
+    accept = parse_accept_header(accept_encoding)
+    best, best_quality = None, 0
+    for encoding in ENCODINGS:
+        quality = accept.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def header(headers, name):
+    name = name.lower()
+    return next((value for key, value in headers if key.lower() == name), None)
+
+
+def compressed_headers(headers, encoding, length):
+    # drops the old length, adds the encoding and Vary, weakens a strong ETag
+    result = []
+    vary = None
+    for key, value in headers:
+        lowered = key.lower()
+        if lowered == 'content-length':
+            continue
+        if lowered == 'vary':
+            vary = value
+            continue
+        if lowered == 'etag' and not value.startswith('W/'):
+            value = 'W/' + value
+        result.append((key, value))
+    result.append(('Content-Encoding', encoding))
+    if vary is None:
+        vary = 'Accept-Encoding'
+    elif 'accept-encoding' not in vary.lower() and vary.strip() != '*':
+        vary += ', Accept-Encoding'
+    result.append(('Vary', vary))
+    if length is not None:
+        result.append(('Content-Length', str(length)))
+    return result
+
+
+class CompressionMiddleware:
+    def __init__(self, app, levels, min_size=MIN_SIZE):
+        self.app = app
+        self.levels = levels
+        self.min_size = min_size
+
+    def __call__(self, environ, start_response):
+        encoding = negotiate(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None or environ['REQUEST_METHOD'] == 'HEAD':
+            return self.app(environ, start_response)
+        captured = []
+        written = []
+
+        def capture(status, headers, exc_info=None):
+            captured[:] = [status, headers, exc_info]
+            return written.append
+
+        body = self.app(environ, capture)
+        status, headers, exc_info = captured
+        level = self.level(status, headers, encoding)
+        if level is None:
+            start_response(status, headers, exc_info)
+            return ClosingIterator(written + list(body) if written else body, getattr(body, 'close', None))
+
+        chunks, size, iterator = list(written), sum(map(len, written)), iter(body)
+        for chunk in iterator:
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= self.min_size and header(headers, 'Content-Length') is None:
+                break
+        else:
+            # the whole body is in hand
+            if size < self.min_size:
+                start_response(status, headers, exc_info)
+                return ClosingIterator(chunks, getattr(body, 'close', None))
+            compressor = ENCODINGS[encoding](level)
+            data = compressor.compress(b''.join(chunks)) + compressor.finish()
+            start_response(status, compressed_headers(headers, encoding, len(data)), exc_info)
+            return ClosingIterator([data], getattr(body, 'close', None))
+
+        start_response(status, compressed_headers(headers, encoding, None), exc_info)
+        return ClosingIterator(self.stream(ENCODINGS[encoding](level), b''.join(chunks), iterator),
+                               getattr(body, 'close', None))
+
+    def level(self, status, headers, encoding):
+        # the compression level for this response, or None to pass it through
+        if status.startswith(NO_BODY_STATUSES) or header(headers, 'Content-Encoding'):
+            return None
+        if 'no-transform' in (header(headers, 'Cache-Control') or '').lower():
+            return None
+        length = header(headers, 'Content-Length')
+        if length is not None and int(length) < self.min_size:
+            return None
+        mimetype = (header(headers, 'Content-Type') or '').split(';')[0].strip().lower()
+        levels = self.levels.get(mimetype)
+        if levels is None:
+            return None
+        return levels[0] if encoding == 'gzip' else levels[1]
+
+    def stream(self, compressor, first, iterator):
+        yield compressor.compress(first, flush=True)
+        for chunk in iterator:
+            if chunk:
+                yield compressor.compress(chunk, flush=True)
+        yield compressor.finish()
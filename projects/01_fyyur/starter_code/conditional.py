@@ -0,0 +1,110 @@
+import datetime
+import functools
+
+from flask import request, session, make_response
+from werkzeug.http import is_resource_modified
+from werkzeug.wrappers import Response
+
+from models import db, Venue, Artist, Show
+
+'''
+Conditional GET for the listing and detail pages.
+
+Venue, Artist and Show carry an updated_at column. Column updates bump it via
+onupdate; write paths that change what a page shows without changing the
+row itself (new shows, genre edits, renamed venues on artist pages) call
+touch(). A validator turns those timestamps into an (etag, last_modified)
+pair with one small query, so a revalidating client gets a 304 without the
+page being loaded or rendered.
+
+Detail validators also take the start time of the latest show that has
+already begun, so a page changes validator when an upcoming show moves into
+the past.
+'''
+
+
+def touch(model, *criteria, now=None):
+    # mark the rows matching criteria as modified; call in the same transaction as the change
+    model.query.filter(*criteria) \
+        .update({model.updated_at: now or datetime.datetime.now()}, synchronize_session=False)
+
+
+def touch_venue_pages(venue_id, now=None):
+    # the venue plus every artist listing a show there, the same pages venue_page_keys() names
+    touch(Venue, Venue.id == venue_id, now=now)
+    touch(Artist, Artist.id.in_(db.select(Show.artist_id).where(Show.venue_id == venue_id)), now=now)
+
+
+def touch_artist_pages(artist_id, now=None):
+    touch(Artist, Artist.id == artist_id, now=now)
+    touch(Venue, Venue.id.in_(db.select(Show.venue_id).where(Show.artist_id == artist_id)), now=now)
+
+
+def validators(key, *timestamps):
+    last_modified = max((timestamp for timestamp in timestamps if timestamp is not None), default=None)
+    if last_modified is None:
+        return None
+    # the timestamps are naive local time, as datetime.now() writes them; HTTP dates are UTC
+    return '%s-%s' % (key, last_modified.isoformat()), last_modified.astimezone(datetime.timezone.utc)
+
+
+def detail_validator(model, fk_column, id):
+    latest_started = db.select(db.func.max(Show.start_time)) \
+        .where(fk_column == model.id, Show.start_time <= datetime.datetime.now()) \
+        .scalar_subquery()
+    row = db.session.query(model.updated_at, latest_started).filter(model.id == id).first()
+    if row is None:
+        return None
+    return validators('%s-%s' % (model.__tablename__.lower(), id), *row)
+
+
+def venue_validator(venue_id):
+    return detail_validator(Venue, Show.venue_id, venue_id)
+
+
+def artist_validator(artist_id):
+    return detail_validator(Artist, Show.artist_id, artist_id)
+
+
+def listing_validator(model, *related):
+    # row count catches deletions, which leave no timestamp behind
+    count, *timestamps = db.session.query(
+        db.func.count(model.id), db.func.max(model.updated_at),
+        *[db.select(db.func.max(other.updated_at)).scalar_subquery() for other in related]).one()
+    return validators('%s-%s' % (model.__tablename__.lower(), count), *timestamps)
+
+
+def venues_validator():
+    return listing_validator(Venue)
+
+
+def artists_validator():
+    return listing_validator(Artist)
+
+
+def shows_validator():
+    return listing_validator(Show, Venue, Artist)
+
+
+def conditional(validator):
+    # validator(**view_args) returns (etag, last_modified), or None to always render
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**kwargs):
+            # flashed messages are consumed by rendering, never answer them with a 304
+            if request.method != 'GET' or session.get('_flashes'):
+                return view(**kwargs)
+            current = validator(**kwargs)
+            if current is None:
+                return view(**kwargs)
+            etag, last_modified = current
+            if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                response = make_response(view(**kwargs))
+            else:
+                response = Response(status=304)
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
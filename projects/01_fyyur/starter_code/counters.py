@@ -0,0 +1,63 @@
+import datetime
+from collections import Counter
+
+from models import db, Venue, Artist, Show
+
+'''
+Venue.upcoming_shows_count and Artist.upcoming_shows_count are denormalized
+counts of shows with start_time > now. Write paths adjust them in the same
+transaction as the show rows; reconcile_upcoming_shows() recomputes them to
+age shows out into the past and to repair any drift.
+'''
+
+COUNTED = ((Venue, Show.venue_id), (Artist, Show.artist_id))
+
+
+def record_show_added(show, now=None):
+    # call after the show is flushed, before commit
+    now = now or datetime.datetime.now()
+    if show.start_time <= now:
+        return
+    for model, fk_column in COUNTED:
+        model.query.filter(model.id == getattr(show, fk_column.key)) \
+            .update({model.upcoming_shows_count: model.upcoming_shows_count + 1}, synchronize_session=False)
+
+
+def record_shows_added(shows, now=None):
+    # batched record_show_added for bulk inserts: shows are dicts with venue_id, artist_id and start_time
+    now = now or datetime.datetime.now()
+    for model, fk_column in COUNTED:
+        added = Counter(show[fk_column.key] for show in shows if show['start_time'] > now)
+        if added:
+            table = model.__table__
+            db.session.execute(
+                table.update()
+                .where(table.c.id == db.bindparam('row_id'))
+                .values(upcoming_shows_count=table.c.upcoming_shows_count + db.bindparam('added')),
+                [{'row_id': id, 'added': count} for id, count in added.items()])
+
+
+def record_shows_removed(*criteria, now=None):
+    # call before deleting the Show rows matching criteria, in the same transaction
+    now = now or datetime.datetime.now()
+    for model, fk_column in COUNTED:
+        removed = db.select(db.func.count(Show.id)) \
+            .where(fk_column == model.id, Show.start_time > now, *criteria) \
+            .scalar_subquery()
+        affected = db.select(fk_column).where(Show.start_time > now, *criteria)
+        model.query.filter(model.id.in_(affected)) \
+            .update({model.upcoming_shows_count: model.upcoming_shows_count - removed}, synchronize_session=False)
+
+
+def reconcile_upcoming_shows(now=None):
+    # returns the number of venue and artist rows whose counter was corrected
+    now = now or datetime.datetime.now()
+    fixed = 0
+    for model, fk_column in COUNTED:
+        actual = db.select(db.func.count(Show.id)) \
+            .where(fk_column == model.id, Show.start_time > now) \
+            .scalar_subquery()
+        fixed += model.query.filter(model.upcoming_shows_count != actual) \
+            .update({model.upcoming_shows_count: actual}, synchronize_session=False)
+    db.session.commit()
+    return fixed
@@ -0,0 +1,36 @@
+import datetime
+
+from conditional import touch
+from counters import record_shows_removed
+from models import db, Venue, Artist, Show
+
+'''
+Set-based deletion of venues and artists.
+
+Shows and genre links reference their venue or artist with ON DELETE
+CASCADE, so one DELETE on the listing table removes them too. Before it
+runs, delete_listings() takes the doomed upcoming shows off the counters on
+the other side and touches the pages that listed them, so everything lands
+in the caller's transaction. The caller commits, then evicts cached pages.
+'''
+
+BULK_DELETE_LIMIT = 1000
+
+# model -> (its column on Show, the other side's column on Show, the other side)
+SIDES = {
+    Venue: (Show.venue_id, Show.artist_id, Artist),
+    Artist: (Show.artist_id, Show.venue_id, Venue),
+}
+
+
+def delete_listings(model, ids, now=None):
+    # returns the ids that existed and were deleted
+    now = now or datetime.datetime.now()
+    fk_column, other_fk_column, other = SIDES[model]
+    ids = [id for (id,) in model.query.with_entities(model.id).filter(model.id.in_(ids))]
+    if not ids:
+        return []
+    record_shows_removed(fk_column.in_(ids), now=now)
+    touch(other, other.id.in_(db.select(other_fk_column).where(fk_column.in_(ids))), now=now)
+    model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
+    return ids
@@ -0,0 +1,106 @@
+import csv
+import datetime
+import io
+import json
+
+from models import db, Venue, Artist, Show, Genre, venue_genres, artist_genres
+
+'''
+Streaming export of venues, artists and shows as CSV or NDJSON.
+
+Each export is a single query read through a server-side cursor (yield_per),
+and rows are serialized one chunk at a time, so memory stays flat no matter
+how large the tables are.
+'''
+
+YIELD_PER = 1000
+
+
+def genre_names(association, fk_column, owner_id):
+    # comma-joined genre names for one venue or artist, as a correlated subquery
+    if db.engine.dialect.name == 'postgresql':
+        joined = db.func.string_agg(Genre.name, db.literal_column("','"))
+    else:
+        joined = db.func.group_concat(Genre.name, ',')
+    return db.select(joined) \
+        .select_from(association.join(Genre, Genre.id == association.c.genre_id)) \
+        .where(fk_column == owner_id) \
+        .scalar_subquery() \
+        .label('genres')
+
+
+def venues_query():
+    return db.session.query(
+        Venue.id, Venue.name, Venue.city, Venue.state, Venue.address, Venue.latitude, Venue.longitude,
+        Venue.phone, Venue.website,
+        Venue.facebook_link, Venue.image_link, Venue.seeking_talent, Venue.seeking_description,
+        Venue.upcoming_shows_count, genre_names(venue_genres, venue_genres.c.venue_id, Venue.id)) \
+        .order_by(Venue.id)
+
+
+def artists_query():
+    return db.session.query(
+        Artist.id, Artist.name, Artist.city, Artist.state, Artist.phone, Artist.website,
+        Artist.facebook_link, Artist.image_link, Artist.seeking_venue, Artist.seeking_description,
+        Artist.upcoming_shows_count, genre_names(artist_genres, artist_genres.c.artist_id, Artist.id)) \
+        .order_by(Artist.id)
+
+
+def shows_query():
+    return db.session.query(
+        Show.id, Show.start_time, Show.end_time, Show.artist_id, Artist.name.label('artist_name'),
+        Show.venue_id, Venue.name.label('venue_name')) \
+        .join(Artist, Artist.id == Show.artist_id) \
+        .join(Venue, Venue.id == Show.venue_id) \
+        .order_by(Show.id)
+
+
+QUERIES = {
+    'venues': venues_query,
+    'artists': artists_query,
+    'shows': shows_query,
+}
+
+
+def export_rows(kind):
+    query = QUERIES[kind]()
+    return [column['name'] for column in query.column_descriptions], query.yield_per(YIELD_PER)
+
+
+def serialize(value):
+    return value.isoformat() if isinstance(value, datetime.datetime) else value
+
+
+def to_csv(columns, rows, chunk_size=YIELD_PER):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for i, row in enumerate(rows, start=1):
+        writer.writerow([serialize(value) for value in row])
+        if i % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def to_ndjson(columns, rows, chunk_size=YIELD_PER):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(columns, [serialize(value) for value in row]))) + '\n')
+        if len(lines) == chunk_size:
+            yield ''.join(lines)
+            lines = []
+    yield ''.join(lines)
+
+
+FORMATS = {
+    'csv': (to_csv, 'text/csv'),
+    'ndjson': (to_ndjson, 'application/x-ndjson'),
+}
+
+
+def export(kind, fmt):
+    # returns (chunk generator, mimetype)
+    serializer, mimetype = FORMATS[fmt]
+    return serializer(*export_rows(kind)), mimetype
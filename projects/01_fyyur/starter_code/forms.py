@@ -1,15 +1,17 @@
 from datetime import datetime
 from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField
-from wtforms.validators import DataRequired, AnyOf, URL, Length, Email, ValidationError
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, FloatField
+from wtforms.validators import DataRequired, AnyOf, URL, Length, Email, NumberRange, Optional, ValidationError
 import re
 
+from models import MAX_SHOW_DURATION
+
 
 def match_phone_number(form, field):
-    if len(field) == 12:
-        match = re.match(r'\d{3}-\d{3}-\d{4}', field)
+    if len(field.data) == 12:
+        match = re.match(r'\d{3}-\d{3}-\d{4}', field.data)
     else:
-        match = re.match(r'\d{10}', field)
+        match = re.match(r'\d{10}', field.data)
     if match:
         return
     else:
@@ -28,6 +30,18 @@ class ShowForm(Form):
         validators=[DataRequired()],
         default=datetime.today()
     )
+    end_time = DateTimeField(
+        'end_time',
+        validators=[Optional()]
+    )
+
+    def validate_end_time(form, field):
+        if field.data is None or form.start_time.data is None:
+            return
+        if field.data <= form.start_time.data:
+            raise ValidationError('The show must end after it starts.')
+        if field.data - form.start_time.data > MAX_SHOW_DURATION:
+            raise ValidationError('Shows can last at most %s.' % MAX_SHOW_DURATION)
 
 
 class VenueForm(Form):
@@ -96,6 +110,12 @@ class VenueForm(Form):
     address = StringField(
         'address', validators=[DataRequired()]
     )
+    latitude = FloatField(
+        'latitude', validators=[Optional(), NumberRange(-90, 90)]
+    )
+    longitude = FloatField(
+        'longitude', validators=[Optional(), NumberRange(-180, 180)]
+    )
     phone = StringField(
         'phone', validators=[Length(min=10, max=12), match_phone_number]
     )
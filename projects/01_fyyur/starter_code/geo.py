@@ -0,0 +1,80 @@
+import math
+
+'''
+Geohash proximity search helpers.
+
+A geohash interleaves longitude and latitude bits into a base32 string, so
+every prefix names a rectangular cell and points in the same cell share the
+prefix. Venue.geohash is indexed; a proximity query picks the longest prefix
+whose cells are at least as large as the search radius, looks up the centre
+cell and its eight neighbours as index range scans, and computes exact
+great-circle distances only for those candidates.
+'''
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+PRECISION = 9  # ~5m cells, finer than any radius we search with
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 110.574
+KM_PER_DEGREE_LNG = 111.320
+
+
+def encode(lat, lng, precision=PRECISION):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lng_range, lng) if even else (lat_range, lat)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    # (lat degrees, lng degrees) spanned by a cell of the given precision
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def search_precision(lat, radius_km):
+    # the longest prefix whose cells are no smaller than the radius, so a 3x3 block covers the circle
+    # cells narrow towards the poles; size them for the circle's poleward edge
+    cos_lat = max(math.cos(math.radians(min(abs(lat) + radius_km / KM_PER_DEGREE_LAT, 90))), 0.01)
+    for precision in range(PRECISION, 0, -1):
+        lat_degrees, lng_degrees = cell_size(precision)
+        if (lat_degrees * KM_PER_DEGREE_LAT >= radius_km
+                and lng_degrees * KM_PER_DEGREE_LNG * cos_lat >= radius_km):
+            return precision
+    return 0
+
+
+def covering_prefixes(lat, lng, radius_km):
+    # geohash prefixes of the cell holding (lat, lng) and its neighbours; [''] matches everything
+    precision = search_precision(lat, radius_km)
+    if precision == 0:
+        return ['']
+    lat_degrees, lng_degrees = cell_size(precision)
+    prefixes = set()
+    for dlat in (-lat_degrees, 0, lat_degrees):
+        for dlng in (-lng_degrees, 0, lng_degrees):
+            neighbour_lat = min(max(lat + dlat, -90.0), 90.0)
+            neighbour_lng = (lng + dlng + 180.0) % 360.0 - 180.0
+            prefixes.add(encode(neighbour_lat, neighbour_lng, precision))
+    return sorted(prefixes)
+
+
+def distance_km(lat1, lng1, lat2, lng2):
+    # haversine great-circle distance
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi, dlambda = phi2 - phi1, math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
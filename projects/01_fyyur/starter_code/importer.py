@@ -0,0 +1,215 @@
+import csv
+import json
+import time
+from collections import Counter
+
+from sqlalchemy import exc
+from werkzeug.datastructures import MultiDict
+
+from cache import page_cache
+from conditional import touch
+from counters import record_shows_added
+from forms import VenueForm, ArtistForm, ShowForm
+from models import db, Venue, Artist, Show, genres_from_names, double_booked, DEFAULT_SHOW_DURATION
+
+'''
+Bulk import of venues, artists and shows from CSV or JSON Lines files.
+
+Rows are streamed, validated with the same forms as the web handlers and
+inserted in batches, one transaction per batch. Shows may reference their
+artist and venue by id or by exact name; references are resolved with one
+query per batch. A batch holding a double booking is retried one show per
+transaction so that only the conflicting shows are rejected.
+'''
+
+BATCH_SIZE = 1000
+
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.rejected = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def reject(self, line, row, errors):
+        self.rejected.append({'line': line, 'row': row, 'errors': errors})
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    @property
+    def rows_per_second(self):
+        total = self.inserted + len(self.rejected)
+        return total / self.elapsed if self.elapsed else 0.0
+
+
+class InvalidRow:
+    # a JSON Lines line that is not a JSON object; validators reject it with its line number
+    def __init__(self, text, error):
+        self.text = text
+        self.error = error
+
+
+def read_rows(path):
+    # yields (line number, row dict); .jsonl/.ndjson files hold one JSON object per line, anything else is CSV.
+    # A JSON line that does not parse to an object comes as an InvalidRow, so the import reports it and goes on
+    if path.endswith(('.jsonl', '.ndjson')):
+        with open(path, encoding='utf-8') as f:
+            for line, text in enumerate(f, start=1):
+                if not text.strip():
+                    continue
+                try:
+                    row = json.loads(text)
+                except ValueError as e:
+                    row = InvalidRow(text.rstrip('\n'), 'Invalid JSON: %s.' % e)
+                else:
+                    if not isinstance(row, dict):
+                        row = InvalidRow(text.rstrip('\n'), 'Not a JSON object.')
+                yield line, row
+    else:
+        with open(path, newline='', encoding='utf-8') as f:
+            for line, row in enumerate(csv.DictReader(f), start=2):
+                yield line, row
+
+
+def batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def to_formdata(row):
+    formdata = MultiDict()
+    for key, value in row.items():
+        if value is None:
+            continue
+        if key == 'genres' and isinstance(value, str):
+            value = [genre.strip() for genre in value.split(',') if genre.strip()]
+        for item in value if isinstance(value, list) else [value]:
+            formdata.add(key, str(item))
+    return formdata
+
+
+def validator(form_class, report):
+    # one form instance re-processed per row; building a form costs more than validating it
+    form = form_class(meta={'csrf': False})
+
+    def validate(line, row):
+        if isinstance(row, InvalidRow):
+            report.reject(line, row.text, {'row': [row.error]})
+            return None
+        form.process(formdata=to_formdata(row))
+        if form.validate():
+            return form.data
+        report.reject(line, row, form.errors)
+        return None
+    return validate
+
+
+def import_listings(model, form_class, rows, batch_size=BATCH_SIZE):
+    # venues and artists; every column on the form except genres maps onto the model
+    report = ImportReport()
+    validate = validator(form_class, report)
+    for batch in batches(rows, batch_size):
+        valid = [data for data in (validate(line, row) for line, row in batch) if data]
+        if not valid:
+            continue
+        genres = {genre.name: genre for genre in genres_from_names(
+            name for data in valid for name in data['genres'])}
+        records = []
+        for data in valid:
+            names = data.pop('genres')
+            records.append(model(genres=[genres[name] for name in names], **data))
+        db.session.add_all(records)
+        db.session.commit()
+        report.inserted += len(records)
+    return report.finish()
+
+
+def import_venues(rows, batch_size=BATCH_SIZE):
+    return import_listings(Venue, VenueForm, rows, batch_size)
+
+
+def import_artists(rows, batch_size=BATCH_SIZE):
+    return import_listings(Artist, ArtistForm, rows, batch_size)
+
+
+def reference(row, id_key, name_key):
+    # an artist/venue reference is an id when one is given, otherwise an exact name
+    value = str(row.get(id_key) or '').strip()
+    return int(value) if value.isdigit() else row.get(name_key)
+
+
+def resolve_references(model, references):
+    # maps every id or name referenced in the batch to an id, in two queries at most
+    ids = {ref for ref in references if isinstance(ref, int)}
+    names = {ref for ref in references if isinstance(ref, str)}
+    resolved = {}
+    if ids:
+        resolved.update((id, id) for (id,) in db.session.query(model.id).filter(model.id.in_(ids)))
+    if names:
+        matches = db.session.query(model.name, model.id).filter(model.name.in_(names)).all()
+        counts = Counter(name for name, id in matches)
+        resolved.update((name, id) for name, id in matches if counts[name] == 1)
+    return resolved
+
+
+def insert_shows(shows):
+    db.session.execute(Show.__table__.insert(), shows)
+    record_shows_added(shows)
+    venue_ids = {show['venue_id'] for show in shows}
+    artist_ids = {show['artist_id'] for show in shows}
+    touch(Venue, Venue.id.in_(venue_ids))
+    touch(Artist, Artist.id.in_(artist_ids))
+    db.session.commit()
+    page_cache.evict(*{'venue:%s' % id for id in venue_ids} | {'artist:%s' % id for id in artist_ids})
+
+
+def import_shows(rows, batch_size=BATCH_SIZE):
+    report = ImportReport()
+    validate = validator(ShowForm, report)
+    for batch in batches(rows, batch_size):
+        valid = []
+        for line, row in batch:
+            data = validate(line, row)
+            if data is not None:
+                end_time = data['end_time'] or data['start_time'] + DEFAULT_SHOW_DURATION
+                valid.append((line, row, data['start_time'], end_time,
+                              reference(row, 'artist_id', 'artist_name'), reference(row, 'venue_id', 'venue_name')))
+        artists = resolve_references(Artist, [artist for line, row, start_time, end_time, artist, venue in valid])
+        venues = resolve_references(Venue, [venue for line, row, start_time, end_time, artist, venue in valid])
+        shows = []
+        for line, row, start_time, end_time, artist, venue in valid:
+            errors = {}
+            if artist not in artists:
+                errors['artist_id'] = ['Unknown or ambiguous artist reference.']
+            if venue not in venues:
+                errors['venue_id'] = ['Unknown or ambiguous venue reference.']
+            if errors:
+                report.reject(line, row, errors)
+            else:
+                shows.append((line, row, {'artist_id': artists[artist], 'venue_id': venues[venue],
+                                          'start_time': start_time, 'end_time': end_time}))
+        if not shows:
+            continue
+        try:
+            insert_shows([show for line, row, show in shows])
+            report.inserted += len(shows)
+        except exc.IntegrityError:
+            db.session.rollback()
+            for line, row, show in shows:
+                try:
+                    insert_shows([show])
+                    report.inserted += 1
+                except exc.IntegrityError as error:
+                    db.session.rollback()
+                    side = double_booked(error) or 'show'
+                    report.reject(line, row, {'start_time': ['The %s already has a show at that time.' % side]})
+    return report.finish()
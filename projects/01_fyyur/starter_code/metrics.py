@@ -0,0 +1,139 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+'''
+Per-endpoint request metrics in Prometheus text format.
+
+Request hooks time each request from before_request until its context is
+torn down, so streamed responses are timed to their last chunk. Cursor
+events on every Engine count the statements issued while a request is
+active and add up their time. Everything is kept in process memory: each
+worker exposes its own numbers and Prometheus sums them across targets.
+'''
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 25, 50, 100)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield '%s_bucket{%s,le="%s"} %d' % (name, labels, bound, cumulative)
+        yield '%s_sum{%s} %s' % (name, labels, self.sum)
+        yield '%s_count{%s} %d' % (name, labels, cumulative)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.reset()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._start_request)
+        app.after_request(self._record_status)
+        app.teardown_request(self._finish_request)
+        if not event.contains(Engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.extensions['metrics'] = self
+
+    def reset(self):
+        with self._lock:
+            self.latency = defaultdict(lambda: Histogram(BUCKETS))
+            self.queries = defaultdict(lambda: Histogram(QUERY_BUCKETS))
+            self.db_seconds = defaultdict(float)
+            self.requests = defaultdict(int)
+
+    def _start_request(self):
+        g._metrics = {'started': time.perf_counter(), 'queries': 0, 'db_seconds': 0.0, 'status': 500}
+
+    def _record_status(self, response):
+        if '_metrics' in g:
+            g._metrics['status'] = response.status_code
+        return response
+
+    def _finish_request(self, error=None):
+        current = g.pop('_metrics', None)
+        if current is None:
+            return
+        elapsed = time.perf_counter() - current['started']
+        # label by route endpoint, not path, to keep the series count bounded
+        endpoint = request.url_rule.endpoint if request.url_rule else 'unmatched'
+        key = (endpoint, request.method)
+        with self._lock:
+            self.latency[key].observe(elapsed)
+            self.queries[key].observe(current['queries'])
+            self.db_seconds[key] += current['db_seconds']
+            self.requests[key + (current['status'],)] += 1
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and '_metrics' in g:
+            conn.info.setdefault('_metrics_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('_metrics_started')
+        if started and has_request_context() and '_metrics' in g:
+            g._metrics['queries'] += 1
+            g._metrics['db_seconds'] += time.perf_counter() - started.pop()
+
+    def render(self):
+        with self._lock:
+            latency = sorted(self.latency.items())
+            queries = sorted(self.queries.items())
+            db_seconds = sorted(self.db_seconds.items())
+            requests = sorted(self.requests.items())
+        lines = [
+            '# HELP fyyur_requests_total Requests handled, by endpoint, method and status.',
+            '# TYPE fyyur_requests_total counter',
+        ]
+        for (endpoint, method, status), count in requests:
+            lines.append('fyyur_requests_total{endpoint="%s",method="%s",status="%s"} %d'
+                         % (escape_label(endpoint), method, status, count))
+        lines += [
+            '# HELP fyyur_request_duration_seconds Request latency, including streamed bodies.',
+            '# TYPE fyyur_request_duration_seconds histogram',
+        ]
+        for (endpoint, method), histogram in latency:
+            lines.extend(histogram.samples('fyyur_request_duration_seconds',
+                                           'endpoint="%s",method="%s"' % (escape_label(endpoint), method)))
+        lines += [
+            '# HELP fyyur_request_queries SQL statements executed per request.',
+            '# TYPE fyyur_request_queries histogram',
+        ]
+        for (endpoint, method), histogram in queries:
+            lines.extend(histogram.samples('fyyur_request_queries',
+                                           'endpoint="%s",method="%s"' % (escape_label(endpoint), method)))
+        lines += [
+            '# HELP fyyur_request_db_seconds_total Time spent executing SQL statements.',
+            '# TYPE fyyur_request_db_seconds_total counter',
+        ]
+        for (endpoint, method), seconds in db_seconds:
+            lines.append('fyyur_request_db_seconds_total{endpoint="%s",method="%s"} %s'
+                         % (escape_label(endpoint), method, seconds))
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
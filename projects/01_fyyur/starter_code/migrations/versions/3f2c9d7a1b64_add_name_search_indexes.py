@@ -0,0 +1,59 @@
+"""add name search indexes
+
+Revision ID: 3f2c9d7a1b64
+Revises: 094f4694b0e0
+Create Date: 2026-10-18 10:12:41.118204
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2c9d7a1b64'
+down_revision = '094f4694b0e0'
+branch_labels = None
+depends_on = None
+
+
+def sqlite_fts(table):
+    fts = table + '_search'
+    return [statement.format(fts=fts, table=table) for statement in (
+        'CREATE VIRTUAL TABLE IF NOT EXISTS "{fts}" USING fts5('
+        'name, content=\'{table}\', content_rowid=\'id\', tokenize=\'trigram\')',
+        'CREATE TRIGGER IF NOT EXISTS "{fts}_ai" AFTER INSERT ON "{table}" BEGIN '
+        'INSERT INTO "{fts}"(rowid, name) VALUES (new.id, new.name); END',
+        'CREATE TRIGGER IF NOT EXISTS "{fts}_ad" AFTER DELETE ON "{table}" BEGIN '
+        'INSERT INTO "{fts}"("{fts}", rowid, name) VALUES (\'delete\', old.id, old.name); END',
+        'CREATE TRIGGER IF NOT EXISTS "{fts}_au" AFTER UPDATE OF name ON "{table}" BEGIN '
+        'INSERT INTO "{fts}"("{fts}", rowid, name) VALUES (\'delete\', old.id, old.name); '
+        'INSERT INTO "{fts}"(rowid, name) VALUES (new.id, new.name); END',
+        'INSERT INTO "{fts}"("{fts}") VALUES (\'rebuild\')',
+    )]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.create_index('ix_Artist_name_trgm', 'Artist', ['name'], postgresql_using='gin',
+                        postgresql_ops={'name': 'gin_trgm_ops'})
+        op.create_index('ix_Venue_name_trgm', 'Venue', ['name'], postgresql_using='gin',
+                        postgresql_ops={'name': 'gin_trgm_ops'})
+    else:
+        # other dialects get a plain index under the same name, matching the models
+        op.create_index('ix_Artist_name_trgm', 'Artist', ['name'])
+        op.create_index('ix_Venue_name_trgm', 'Venue', ['name'])
+    if dialect == 'sqlite':
+        for table in ('Artist', 'Venue'):
+            for statement in sqlite_fts(table):
+                op.execute(statement)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        for table in ('Venue', 'Artist'):
+            for suffix in ('_ai', '_ad', '_au'):
+                op.execute('DROP TRIGGER IF EXISTS "{0}_search{1}"'.format(table, suffix))
+            op.execute('DROP TABLE IF EXISTS "{0}_search"'.format(table))
+    op.drop_index('ix_Venue_name_trgm', table_name='Venue')
+    op.drop_index('ix_Artist_name_trgm', table_name='Artist')
@@ -0,0 +1,40 @@
+"""add keyset pagination indexes
+
+Revision ID: 5d7be2f91c3a
+Revises: c81e5a04d9f2
+Create Date: 2026-10-18 11:47:05.392118
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5d7be2f91c3a'
+down_revision = 'c81e5a04d9f2'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_Artist_name_id', 'Artist', ['name', 'id']),
+    ('ix_Show_start_time_id', 'Show', ['start_time', 'id']),
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.drop_index(name, table_name=table)
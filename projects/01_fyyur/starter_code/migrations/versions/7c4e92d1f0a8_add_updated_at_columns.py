@@ -0,0 +1,42 @@
+"""add updated_at columns
+
+Revision ID: 7c4e92d1f0a8
+Revises: e3b6f1a8c205
+Create Date: 2026-10-18 16:02:37.118452
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c4e92d1f0a8'
+down_revision = 'e3b6f1a8c205'
+branch_labels = None
+depends_on = None
+
+TABLES = ['Venue', 'Artist', 'Show']
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        # SQLite cannot add a column with a non-constant default
+        server_default = sa.text("'1970-01-01 00:00:00'")
+    else:
+        server_default = sa.func.now()
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), server_default=server_default, nullable=False))
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for table in TABLES:
+                op.create_index('ix_%s_updated_at' % table, table, ['updated_at'],
+                                postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for table in TABLES:
+            op.create_index('ix_%s_updated_at' % table, table, ['updated_at'])
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index('ix_%s_updated_at' % table, table_name=table)
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,38 @@
+"""add upcoming shows counters
+
+Revision ID: a94d0c6e2b17
+Revises: 5d7be2f91c3a
+Create Date: 2026-10-18 13:20:44.861577
+
+"""
+import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a94d0c6e2b17'
+down_revision = '5d7be2f91c3a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Artist', sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('Venue', sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+    # backfill; `flask fyyur reconcile-counters` keeps them current afterwards. Start times are naive
+    # local times, compared against datetime.now() as counters.py does, not the database's UTC clock
+    bind = op.get_bind()
+    now = datetime.datetime.now()
+    bind.execute(sa.text(
+        'UPDATE "Artist" SET upcoming_shows_count = (SELECT count(*) FROM "Show" '
+        'WHERE "Show".artist_id = "Artist".id AND "Show".start_time > :now)'), {'now': now})
+    bind.execute(sa.text(
+        'UPDATE "Venue" SET upcoming_shows_count = (SELECT count(*) FROM "Show" '
+        'WHERE "Show".venue_id = "Venue".id AND "Show".start_time > :now)'), {'now': now})
+
+
+def downgrade():
+    op.drop_column('Venue', 'upcoming_shows_count')
+    op.drop_column('Artist', 'upcoming_shows_count')
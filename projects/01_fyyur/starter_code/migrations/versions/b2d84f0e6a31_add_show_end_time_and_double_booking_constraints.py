@@ -0,0 +1,84 @@
+"""add show end time and double booking constraints
+
+Revision ID: b2d84f0e6a31
+Revises: 7c4e92d1f0a8
+Create Date: 2026-10-18 17:41:09.530216
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d84f0e6a31'
+down_revision = '7c4e92d1f0a8'
+branch_labels = None
+depends_on = None
+
+# the definitions in models.double_booking_ddl() as of this revision
+EXCLUSION_CONSTRAINTS = [
+    'ALTER TABLE "Show" ADD CONSTRAINT "ex_Show_venue_id_during" EXCLUDE USING gist (venue_id WITH =, tsrange(start_time, end_time) WITH &&)',
+    'ALTER TABLE "Show" ADD CONSTRAINT "ex_Show_artist_id_during" EXCLUDE USING gist (artist_id WITH =, tsrange(start_time, end_time) WITH &&)',
+]
+
+TRIGGERS = [
+    '''CREATE TRIGGER IF NOT EXISTS "Show_double_booking_bi" BEFORE INSERT ON "Show" BEGIN
+    SELECT RAISE(ABORT, 'show_too_long') WHERE (julianday(NEW.end_time) - julianday(NEW.start_time)) * 86400 > 86400 + 1;
+    SELECT RAISE(ABORT, 'show_venue_overlap') WHERE EXISTS (SELECT 1 FROM "Show" WHERE venue_id = NEW.venue_id AND start_time > datetime(NEW.start_time, '-86400 seconds') AND start_time < NEW.end_time AND end_time > NEW.start_time);
+    SELECT RAISE(ABORT, 'show_artist_overlap') WHERE EXISTS (SELECT 1 FROM "Show" WHERE artist_id = NEW.artist_id AND start_time > datetime(NEW.start_time, '-86400 seconds') AND start_time < NEW.end_time AND end_time > NEW.start_time);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS "Show_double_booking_bu" BEFORE UPDATE OF venue_id, artist_id, start_time, end_time ON "Show" BEGIN
+    SELECT RAISE(ABORT, 'show_too_long') WHERE (julianday(NEW.end_time) - julianday(NEW.start_time)) * 86400 > 86400 + 1;
+    SELECT RAISE(ABORT, 'show_venue_overlap') WHERE EXISTS (SELECT 1 FROM "Show" WHERE venue_id = NEW.venue_id AND id != NEW.id AND start_time > datetime(NEW.start_time, '-86400 seconds') AND start_time < NEW.end_time AND end_time > NEW.start_time);
+    SELECT RAISE(ABORT, 'show_artist_overlap') WHERE EXISTS (SELECT 1 FROM "Show" WHERE artist_id = NEW.artist_id AND id != NEW.id AND start_time > datetime(NEW.start_time, '-86400 seconds') AND start_time < NEW.end_time AND end_time > NEW.start_time);
+    END''',
+]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    # existing shows last three hours, cut short where the venue or artist has a later show,
+    # so the backfill never creates a double booking
+    if dialect == 'postgresql':
+        op.execute('''
+            UPDATE "Show" SET end_time = LEAST(s.start_time + interval '3 hours', s.next_at_venue, s.next_by_artist)
+            FROM (SELECT id, start_time,
+                         LEAD(start_time) OVER (PARTITION BY venue_id ORDER BY start_time, id) AS next_at_venue,
+                         LEAD(start_time) OVER (PARTITION BY artist_id ORDER BY start_time, id) AS next_by_artist
+                  FROM "Show") AS s
+            WHERE "Show".id = s.id''')
+    else:
+        op.execute('''
+            UPDATE "Show" SET end_time = (
+                SELECT min(datetime(s.start_time, '+3 hours'),
+                           coalesce(s.next_at_venue, '9999-12-31'), coalesce(s.next_by_artist, '9999-12-31'))
+                FROM (SELECT id, start_time,
+                             LEAD(start_time) OVER (PARTITION BY venue_id ORDER BY start_time, id) AS next_at_venue,
+                             LEAD(start_time) OVER (PARTITION BY artist_id ORDER BY start_time, id) AS next_by_artist
+                      FROM "Show") AS s
+                WHERE s.id = "Show".id)''')
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.alter_column('end_time', existing_type=sa.DateTime(), nullable=False)
+        batch_op.create_check_constraint('ck_Show_end_time', 'end_time >= start_time')
+
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        for statement in EXCLUSION_CONSTRAINTS:
+            op.execute(statement)
+    elif dialect == 'sqlite':
+        for statement in TRIGGERS:
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.drop_constraint('ex_Show_artist_id_during', 'Show')
+        op.drop_constraint('ex_Show_venue_id_during', 'Show')
+    elif dialect == 'sqlite':
+        op.execute('DROP TRIGGER IF EXISTS "Show_double_booking_bu"')
+        op.execute('DROP TRIGGER IF EXISTS "Show_double_booking_bi"')
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.drop_constraint('ck_Show_end_time', type_='check')
+        batch_op.drop_column('end_time')
@@ -0,0 +1,41 @@
+"""add show composite indexes
+
+Revision ID: c81e5a04d9f2
+Revises: 3f2c9d7a1b64
+Create Date: 2026-10-18 11:02:17.540913
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c81e5a04d9f2'
+down_revision = '3f2c9d7a1b64'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_Show_venue_id_start_time', ['venue_id', 'start_time']),
+    ('ix_Show_artist_id_start_time', ['artist_id', 'start_time']),
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction and does not lock out writes
+        with op.get_context().autocommit_block():
+            for name, columns in INDEXES:
+                op.create_index(name, 'Show', columns, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, columns in INDEXES:
+            op.create_index(name, 'Show', columns)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name, columns in INDEXES:
+                op.drop_index(name, table_name='Show', postgresql_concurrently=True, if_exists=True)
+    else:
+        for name, columns in INDEXES:
+            op.drop_index(name, table_name='Show')
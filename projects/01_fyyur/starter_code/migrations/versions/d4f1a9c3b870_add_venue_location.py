@@ -0,0 +1,47 @@
+"""add venue location
+
+Revision ID: d4f1a9c3b870
+Revises: b2d84f0e6a31
+Create Date: 2026-10-18 18:52:37.204118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f1a9c3b870'
+down_revision = 'b2d84f0e6a31'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_Venue_geohash', 'Venue', ['geohash']),
+]
+
+
+def upgrade():
+    # nullable, with no backfill: existing venues have no coordinates until they are edited
+    op.add_column('Venue', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('Venue', sa.Column('longitude', sa.Float(), nullable=True))
+    op.add_column('Venue', sa.Column('geohash', sa.String(length=9), nullable=True))
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.drop_index(name, table_name=table)
+    op.drop_column('Venue', 'geohash')
+    op.drop_column('Venue', 'longitude')
+    op.drop_column('Venue', 'latitude')
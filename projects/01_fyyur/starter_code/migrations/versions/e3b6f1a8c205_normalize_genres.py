@@ -0,0 +1,70 @@
+"""normalize genres
+
+Revision ID: e3b6f1a8c205
+Revises: a94d0c6e2b17
+Create Date: 2026-10-18 14:05:32.207716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3b6f1a8c205'
+down_revision = 'a94d0c6e2b17'
+branch_labels = None
+depends_on = None
+
+OWNERS = [('Venue', 'VenueGenre', 'venue_id'), ('Artist', 'ArtistGenre', 'artist_id')]
+
+
+def upgrade():
+    genre = op.create_table('Genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    for owner, association, fk in OWNERS:
+        op.create_table(association,
+        sa.Column(fk, sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint([fk], [owner + '.id'], ),
+        sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ),
+        sa.PrimaryKeyConstraint(fk, 'genre_id')
+        )
+        op.create_index('ix_{}_genre_id_{}'.format(association, fk), association, ['genre_id', fk])
+
+    # move the comma-joined strings into the association tables
+    bind = op.get_bind()
+    links = {}
+    for owner, association, fk in OWNERS:
+        rows = bind.execute(sa.text('SELECT id, genres FROM "{}" WHERE genres IS NOT NULL'.format(owner)))
+        links[owner] = [(owner_id, name) for owner_id, genres in rows
+                        for name in dict.fromkeys(name.strip() for name in genres.split(',')) if name]
+    names = sorted({name for owner_links in links.values() for owner_id, name in owner_links})
+    op.bulk_insert(genre, [{'name': name} for name in names])
+    genre_ids = dict((name, genre_id) for genre_id, name in bind.execute(sa.text('SELECT id, name FROM "Genre"')))
+    for owner, association, fk in OWNERS:
+        table = sa.table(association, sa.column(fk, sa.Integer), sa.column('genre_id', sa.Integer))
+        op.bulk_insert(table, [{fk: owner_id, 'genre_id': genre_ids[name]} for owner_id, name in links[owner]])
+        op.drop_column(owner, 'genres')
+
+
+def downgrade():
+    op.add_column('Venue', sa.Column('genres', sa.String(), nullable=True))
+    op.add_column('Artist', sa.Column('genres', sa.String(length=120), nullable=True))
+    bind = op.get_bind()
+    for owner, association, fk in OWNERS:
+        joined = {}
+        rows = bind.execute(sa.text(
+            'SELECT a.{0}, g.name FROM "{1}" a JOIN "Genre" g ON g.id = a.genre_id '
+            'ORDER BY a.{0}, g.name'.format(fk, association)))
+        for owner_id, name in rows:
+            joined.setdefault(owner_id, []).append(name)
+        for owner_id, names in joined.items():
+            bind.execute(sa.text('UPDATE "{}" SET genres = :genres WHERE id = :id'.format(owner)),
+                         {'genres': ','.join(names), 'id': owner_id})
+        op.drop_index('ix_{}_genre_id_{}'.format(association, fk), table_name=association)
+        op.drop_table(association)
+    op.drop_table('Genre')
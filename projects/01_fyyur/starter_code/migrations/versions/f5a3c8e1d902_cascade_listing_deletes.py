@@ -0,0 +1,61 @@
+"""cascade listing deletes
+
+Revision ID: f5a3c8e1d902
+Revises: d4f1a9c3b870
+Create Date: 2026-10-18 19:36:12.817340
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5a3c8e1d902'
+down_revision = 'd4f1a9c3b870'
+branch_labels = None
+depends_on = None
+
+# (table, column, referenced table); the constraints carry Postgres' default names
+FOREIGN_KEYS = [
+    ('Show', 'venue_id', 'Venue'),
+    ('Show', 'artist_id', 'Artist'),
+    ('VenueGenre', 'venue_id', 'Venue'),
+    ('ArtistGenre', 'artist_id', 'Artist'),
+]
+NAMING_CONVENTION = {'fk': '%(table_name)s_%(column_0_name)s_fkey'}
+
+
+def replace_foreign_keys(ondelete):
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        # NOT VALID swaps each constraint under a brief lock; validating afterwards scans
+        # the table without blocking writes
+        for table, column, referenced in FOREIGN_KEYS:
+            name = '%s_%s_fkey' % (table, column)
+            op.execute('ALTER TABLE "{table}" DROP CONSTRAINT "{name}", ADD CONSTRAINT "{name}" '
+                       'FOREIGN KEY ({column}) REFERENCES "{referenced}" (id){ondelete} NOT VALID'.format(
+                           table=table, name=name, column=column, referenced=referenced,
+                           ondelete=' ON DELETE ' + ondelete if ondelete else ''))
+        for table, column, referenced in FOREIGN_KEYS:
+            op.execute('ALTER TABLE "%s" VALIDATE CONSTRAINT "%s_%s_fkey"' % (table, table, column))
+        return
+    # SQLite cannot alter a constraint; batch mode rebuilds the table, which drops its triggers
+    for table in dict.fromkeys(table for table, column, referenced in FOREIGN_KEYS):
+        triggers = bind.execute(sa.text("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = :table"),
+                                {'table': table}).scalars().all()
+        with op.batch_alter_table(table, recreate='always', naming_convention=NAMING_CONVENTION) as batch_op:
+            for fk_table, column, referenced in FOREIGN_KEYS:
+                if fk_table == table:
+                    name = '%s_%s_fkey' % (table, column)
+                    batch_op.drop_constraint(name, type_='foreignkey')
+                    batch_op.create_foreign_key(name, referenced, [column], ['id'], ondelete=ondelete)
+        for statement in triggers:
+            op.execute(statement)
+
+
+def upgrade():
+    replace_foreign_keys('CASCADE')
+
+
+def downgrade():
+    replace_foreign_keys(None)
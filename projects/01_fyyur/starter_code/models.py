@@ -0,0 +1,291 @@
+import datetime
+import sqlite3
+
+from sqlalchemy import DDL, event
+from sqlalchemy.engine import Engine
+
+import geo
+from replicas import RoutingSQLAlchemy
+
+# sessions read from a replica during GET requests when replicas are configured
+db = RoutingSQLAlchemy()
+
+'''
+setup_db(app)
+    binds a flask application and a SQLAlchemy service
+    engines get their pool from pooling.engine_options(): TimedQueuePool, so
+    pool_stats() can report checkout waits, except on SQLite
+'''
+
+
+def setup_db(app):
+    db.app = app
+    db.init_app(app)
+    return db
+
+
+'''
+Shows and genre links go with their venue or artist through ON DELETE
+CASCADE. SQLite only enforces foreign keys, cascades included, on
+connections that turn them on.
+'''
+
+
+@event.listens_for(Engine, 'connect')
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.execute('PRAGMA foreign_keys = ON')
+
+
+'''
+name_search_ddl(table)
+    SQLite FTS5 (trigram) index over <table>.name, kept in sync by triggers.
+    Postgres uses a pg_trgm GIN index declared on the model instead.
+'''
+
+
+def name_search_ddl(table):
+    fts = table + '_search'
+    create = [
+        'CREATE VIRTUAL TABLE IF NOT EXISTS "{fts}" USING fts5('
+        'name, content=\'{table}\', content_rowid=\'id\', tokenize=\'trigram\')',
+        'CREATE TRIGGER IF NOT EXISTS "{fts}_ai" AFTER INSERT ON "{table}" BEGIN '
+        'INSERT INTO "{fts}"(rowid, name) VALUES (new.id, new.name); END',
+        'CREATE TRIGGER IF NOT EXISTS "{fts}_ad" AFTER DELETE ON "{table}" BEGIN '
+        'INSERT INTO "{fts}"("{fts}", rowid, name) VALUES (\'delete\', old.id, old.name); END',
+        'CREATE TRIGGER IF NOT EXISTS "{fts}_au" AFTER UPDATE OF name ON "{table}" BEGIN '
+        'INSERT INTO "{fts}"("{fts}", rowid, name) VALUES (\'delete\', old.id, old.name); '
+        'INSERT INTO "{fts}"(rowid, name) VALUES (new.id, new.name); END',
+        'INSERT INTO "{fts}"("{fts}") VALUES (\'rebuild\')',
+    ]
+    drop = ['DROP TABLE IF EXISTS "{fts}"']
+    return ([statement.format(fts=fts, table=table) for statement in create],
+            [statement.format(fts=fts) for statement in drop])
+
+
+def trigram_index(table):
+    return db.Index('ix_%s_name_trgm' % table, 'name', postgresql_using='gin',
+                    postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+event.listen(db.metadata, 'before_create',
+             DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'))
+event.listen(db.metadata, 'before_create',
+             DDL('CREATE EXTENSION IF NOT EXISTS btree_gist').execute_if(dialect='postgresql'))
+
+'''
+double_booking_ddl()
+    Rejects a show that overlaps another show at the same venue or by the
+    same artist. Postgres uses GiST exclusion constraints over
+    tsrange(start_time, end_time). SQLite uses triggers running an overlap
+    query that the (venue_id, start_time) and (artist_id, start_time) indexes
+    answer with a range seek: shows last at most MAX_SHOW_DURATION, so only
+    shows starting within that window before the new one can overlap it.
+'''
+
+DEFAULT_SHOW_DURATION = datetime.timedelta(hours=3)
+MAX_SHOW_DURATION = datetime.timedelta(hours=24)
+DOUBLE_BOOKING_ERRORS = {
+    'venue': ('ex_Show_venue_id_during', 'show_venue_overlap'),
+    'artist': ('ex_Show_artist_id_during', 'show_artist_overlap'),
+}
+
+
+def double_booking_ddl():
+    postgresql = [
+        'ALTER TABLE "Show" ADD CONSTRAINT "ex_Show_{fk}_id_during" '
+        'EXCLUDE USING gist ({fk}_id WITH =, tsrange(start_time, end_time) WITH &&)'.format(fk=side)
+        for side in DOUBLE_BOOKING_ERRORS
+    ]
+    seconds = int(MAX_SHOW_DURATION.total_seconds())
+    # julianday() is a float; allow a second of rounding
+    checks = ['SELECT RAISE(ABORT, \'show_too_long\') '
+              'WHERE (julianday(NEW.end_time) - julianday(NEW.start_time)) * 86400 > {seconds} + 1;']
+    checks += ['SELECT RAISE(ABORT, \'show_{side}_overlap\') WHERE EXISTS (SELECT 1 FROM "Show" '
+               'WHERE {side}_id = NEW.{side}_id{{not_self}} '
+               'AND start_time > datetime(NEW.start_time, \'-{{seconds}} seconds\') '
+               'AND start_time < NEW.end_time AND end_time > NEW.start_time);'.format(side=side)
+               for side in DOUBLE_BOOKING_ERRORS]
+    body = ' '.join(checks)
+    sqlite = [
+        'CREATE TRIGGER IF NOT EXISTS "Show_double_booking_bi" BEFORE INSERT ON "Show" '
+        'BEGIN ' + body.format(seconds=seconds, not_self='') + ' END',
+        'CREATE TRIGGER IF NOT EXISTS "Show_double_booking_bu" '
+        'BEFORE UPDATE OF venue_id, artist_id, start_time, end_time ON "Show" '
+        'BEGIN ' + body.format(seconds=seconds, not_self=' AND id != NEW.id') + ' END',
+    ]
+    return postgresql, sqlite
+
+
+def default_end_time(context):
+    return context.get_current_parameters()['start_time'] + DEFAULT_SHOW_DURATION
+
+
+'''
+double_booked(error)
+    'venue' or 'artist' when an IntegrityError came from the double booking
+    constraint on that side, otherwise None
+'''
+
+
+def double_booked(error):
+    for side, names in DOUBLE_BOOKING_ERRORS.items():
+        if any(name in str(error.orig) for name in names):
+            return side
+    return None
+
+
+'''
+Genre
+
+'''
+
+
+class Genre(db.Model):
+    __tablename__ = 'Genre'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+
+venue_genres = db.Table(
+    'VenueGenre',
+    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+    db.Index('ix_VenueGenre_genre_id_venue_id', 'genre_id', 'venue_id'),
+)
+
+artist_genres = db.Table(
+    'ArtistGenre',
+    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+    db.Index('ix_ArtistGenre_genre_id_artist_id', 'genre_id', 'artist_id'),
+)
+
+'''
+genres_from_names(names)
+    Genre rows for the given names, creating any that do not exist yet
+'''
+
+
+def genres_from_names(names):
+    names = list(dict.fromkeys(name.strip() for name in names if name.strip()))
+    if not names:
+        return []
+    existing = {genre.name: genre for genre in Genre.query.filter(Genre.name.in_(names))}
+    for name in names:
+        if name not in existing:
+            existing[name] = Genre(name=name)
+            db.session.add(existing[name])
+    return [existing[name] for name in names]
+
+
+'''
+Venue
+
+'''
+
+
+class Venue(db.Model):
+    __tablename__ = 'Venue'
+    __table_args__ = (
+        trigram_index('Venue'),
+        db.Index('ix_Venue_updated_at', 'updated_at'),
+        db.Index('ix_Venue_geohash', 'geohash'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(), nullable=False)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
+    address = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    website = db.Column(db.String(120))
+    seeking_talent = db.Column(db.Boolean)
+    seeking_description = db.Column(db.String())
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geohash = db.Column(db.String(geo.PRECISION))
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime(), nullable=False, default=datetime.datetime.now,
+                           onupdate=datetime.datetime.now, server_default=db.func.now())
+    shows = db.relationship('Show', backref='venue', lazy=True, passive_deletes=True)
+    genres = db.relationship('Genre', secondary=venue_genres, lazy=True, order_by='Genre.name')
+
+
+@event.listens_for(Venue, 'before_insert')
+@event.listens_for(Venue, 'before_update')
+def set_venue_geohash(mapper, connection, venue):
+    # Core inserts (the seeder) bypass this and set geohash themselves
+    if venue.latitude is None or venue.longitude is None:
+        venue.geohash = None
+    else:
+        venue.geohash = geo.encode(venue.latitude, venue.longitude)
+
+
+'''
+Artist
+
+'''
+
+
+class Artist(db.Model):
+    __tablename__ = 'Artist'
+    __table_args__ = (
+        trigram_index('Artist'),
+        db.Index('ix_Artist_name_id', 'name', 'id'),
+        db.Index('ix_Artist_updated_at', 'updated_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, nullable=False)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
+    phone = db.Column(db.String(120))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    website = db.Column(db.String(120))
+    seeking_venue = db.Column(db.Boolean)
+    seeking_description = db.Column(db.String())
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime(), nullable=False, default=datetime.datetime.now,
+                           onupdate=datetime.datetime.now, server_default=db.func.now())
+    shows = db.relationship('Show', backref='artist', lazy=True, passive_deletes=True)
+    genres = db.relationship('Genre', secondary=artist_genres, lazy=True, order_by='Genre.name')
+
+
+'''
+Show
+
+'''
+
+
+class Show(db.Model):
+    __tablename__ = 'Show'
+    __table_args__ = (
+        db.CheckConstraint('end_time >= start_time', name='ck_Show_end_time'),
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+        db.Index('ix_Show_updated_at', 'updated_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), nullable=False)
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), nullable=False)
+    start_time = db.Column(db.DateTime(), nullable=False)
+    end_time = db.Column(db.DateTime(), nullable=False, default=default_end_time)
+    updated_at = db.Column(db.DateTime(), nullable=False, default=datetime.datetime.now,
+                           onupdate=datetime.datetime.now, server_default=db.func.now())
+
+
+for model in (Venue, Artist):
+    create_statements, drop_statements = name_search_ddl(model.__tablename__)
+    for statement in create_statements:
+        event.listen(model.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+    for statement in drop_statements:
+        event.listen(model.__table__, 'before_drop', DDL(statement).execute_if(dialect='sqlite'))
+
+postgresql_statements, sqlite_statements = double_booking_ddl()
+for statement in postgresql_statements:
+    event.listen(Show.__table__, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+for statement in sqlite_statements:
+    event.listen(Show.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
@@ -0,0 +1,74 @@
+import base64
+import datetime
+import json
+
+from sqlalchemy import tuple_
+
+PAGE_SIZE = 20
+
+'''
+Keyset (cursor) pagination.
+
+A page is addressed by the sort key of the row just outside it, so fetching
+any page costs one index range scan of `per_page + 1` rows no matter how deep
+into the listing it is. `keys` must be a unique ordering, e.g. (start_time, id).
+'''
+
+
+class Page:
+    def __init__(self, items, prev_cursor=None, next_cursor=None):
+        self.items = items
+        self.prev_cursor = prev_cursor
+        self.next_cursor = next_cursor
+
+
+def encode_cursor(values):
+    values = [value.isoformat() if isinstance(value, datetime.datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, keys):
+    # raises ValueError on anything that is not a cursor produced by encode_cursor
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (TypeError, ValueError) as e:
+        raise ValueError('invalid cursor') from e
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise ValueError('invalid cursor')
+    decoded = []
+    for key, value in zip(keys, values):
+        python_type = key.type.python_type
+        if python_type is datetime.datetime:
+            if not isinstance(value, str):
+                raise ValueError('invalid cursor')
+            value = datetime.datetime.fromisoformat(value)
+        elif not isinstance(value, python_type):
+            raise ValueError('invalid cursor')
+        decoded.append(value)
+    return decoded
+
+
+def keyset_page(query, keys, after=None, before=None, per_page=PAGE_SIZE):
+    def cursor_of(row):
+        return encode_cursor([getattr(row, key.key) for key in keys])
+
+    if before is not None:
+        rows = query.filter(tuple_(*keys) < tuple_(*decode_cursor(before, keys))) \
+            .order_by(*[key.desc() for key in keys]) \
+            .limit(per_page + 1) \
+            .all()
+        has_prev = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_next = True
+    else:
+        if after is not None:
+            query = query.filter(tuple_(*keys) > tuple_(*decode_cursor(after, keys)))
+        rows = query.order_by(*keys).limit(per_page + 1).all()
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_prev = after is not None
+    if not rows:
+        return Page(rows)
+    return Page(rows,
+                prev_cursor=cursor_of(rows[0]) if has_prev else None,
+                next_cursor=cursor_of(rows[-1]) if has_next else None)
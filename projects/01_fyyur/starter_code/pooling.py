@@ -0,0 +1,78 @@
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+'''
+Connection pool instrumentation.
+
+TimedQueuePool is a QueuePool that records how long each checkout waited for
+a connection and how many timed out. pool_stats(engine) reports those along
+with the pool's live occupancy. Numbers are per process: each worker has its
+own engine and pool, so size workers so that
+workers * (pool_size + max_overflow) stays under Postgres max_connections.
+
+engine_options(url, options) applies the pool to an engine's options. SQLite
+keeps the pool SQLAlchemy picks for it (one connection per checkout for a
+file, a single shared one in memory): its connections refuse to be used by a
+thread other than the one that opened them, which a queue pool would do.
+'''
+
+# options only a queue pool takes
+QUEUE_POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout')
+
+
+class TimedQueuePool(QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    stats = {'pool': type(pool).__name__, 'status': pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'max_overflow': pool._max_overflow,
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            # QueuePool counts overflow from -size; only connections beyond size are overflow
+            'overflow': max(pool.overflow(), 0),
+        })
+    if isinstance(pool, TimedQueuePool):
+        stats.update({
+            'checkouts': pool.checkouts,
+            'timeouts': pool.timeouts,
+            'avg_checkout_wait_ms': 1000 * pool.wait_total / pool.checkouts if pool.checkouts else 0.0,
+            'max_checkout_wait_ms': 1000 * pool.wait_max,
+        })
+    return stats
+
+
+def engine_options(url, options):
+    # create_engine() options for url: TimedQueuePool with the configured sizing, except on SQLite
+    if make_url(url).get_backend_name() == 'sqlite':
+        return {key: value for key, value in options.items() if key not in QUEUE_POOL_OPTIONS}
+    return {'poolclass': TimedQueuePool, **options}
@@ -0,0 +1,75 @@
+import functools
+import logging
+from contextvars import ContextVar
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+'''
+Query budgets.
+
+    with query_budget(3):
+        ...
+
+    @app.route('/venues')
+    @query_budget(2)
+    def venues():
+        ...
+
+count the SQL statements executed inside the block or view. Going over the
+budget raises QueryBudgetExceeded when the app is in TESTING mode (or
+strict=True), so an N+1 regression fails the test suite; otherwise a warning
+listing the statements is logged and the request carries on.
+'''
+
+_active_budgets = ContextVar('query_budgets', default=())
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    for budget in _active_budgets.get():
+        budget.statements.append(statement)
+
+
+class query_budget:
+    def __init__(self, max_queries, name=None, strict=None):
+        self.max_queries = max_queries
+        self.name = name
+        self.strict = strict
+        self.statements = []
+
+    def __enter__(self):
+        self.statements = []
+        self._token = _active_budgets.set(_active_budgets.get() + (self,))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _active_budgets.reset(self._token)
+        if exc_type is None:
+            self.check()
+
+    def __call__(self, view):
+        # a fresh budget per call, so concurrent requests never share a count
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with query_budget(self.max_queries, self.name or view.__name__, self.strict):
+                return view(*args, **kwargs)
+        return wrapper
+
+    def check(self):
+        if len(self.statements) <= self.max_queries:
+            return
+        message = '%s executed %d queries, over its budget of %d:\n%s' % (
+            self.name or 'block', len(self.statements), self.max_queries, '\n'.join(self.statements))
+        strict = self.strict
+        if strict is None:
+            strict = has_app_context() and current_app.testing
+        if strict:
+            raise QueryBudgetExceeded(message)
+        logger = current_app.logger if has_app_context() else logging.getLogger(__name__)
+        logger.warning(message)
@@ -0,0 +1,148 @@
+import itertools
+import logging
+import sqlite3
+import threading
+import time
+
+from flask import g, has_request_context, request, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import create_engine, event, exc, orm
+
+from pooling import engine_options
+
+'''
+Read replica routing.
+
+With SQLALCHEMY_REPLICA_URIS set, GET and HEAD requests read from one of the
+replicas, picked round-robin per request. Everything else stays on the
+primary: other methods, flushes and DML statements issued in any request,
+CLI commands, and a client's reads for REPLICA_READ_YOUR_WRITES_SECONDS
+after it sent a write, so the redirect after a form post shows the change
+even while the replica lags. Replica connections are opened read-only.
+
+Each replica is probed with SELECT 1 at most every
+REPLICA_HEALTH_CHECK_INTERVAL seconds when picked; one that fails is skipped
+until a later probe succeeds, and reads fall back to the primary when no
+replica is healthy.
+'''
+
+SAFE_METHODS = ('GET', 'HEAD')
+logger = logging.getLogger(__name__)
+
+
+def read_only(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.execute('PRAGMA query_only = ON')
+    else:
+        cursor = dbapi_connection.cursor()
+        cursor.execute('SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY')
+        cursor.close()
+        dbapi_connection.commit()
+
+
+class Replica:
+    def __init__(self, uri, options):
+        self.engine = create_engine(uri, **engine_options(uri, options))
+        event.listen(self.engine, 'connect', read_only)
+        self.name = self.engine.url.render_as_string(hide_password=True)
+        self.healthy = True
+        self.checked_at = None
+
+    def check(self):
+        try:
+            with self.engine.connect() as connection:
+                connection.exec_driver_sql('SELECT 1')
+        except exc.DBAPIError as error:
+            if self.healthy:
+                logger.warning('read replica %s failed its health check: %s', self.name, error)
+            self.healthy = False
+        else:
+            if not self.healthy:
+                logger.warning('read replica %s is healthy again', self.name)
+            self.healthy = True
+        return self.healthy
+
+
+class Replicas:
+    def __init__(self, app=None):
+        self.replicas = []
+        self._lock = threading.Lock()
+        self._next = itertools.count()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.dispose()
+        options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+        self.replicas = [Replica(uri, options) for uri in app.config.get('SQLALCHEMY_REPLICA_URIS') or ()]
+        self.health_check_interval = app.config.get('REPLICA_HEALTH_CHECK_INTERVAL', 5)
+        self.read_your_writes_seconds = app.config.get('REPLICA_READ_YOUR_WRITES_SECONDS', 10)
+        if 'replicas' not in app.extensions:
+            app.before_request(self._choose)
+            app.after_request(self._remember_write)
+            app.teardown_request(self._release)
+        app.extensions['replicas'] = self
+
+    def dispose(self, close=True):
+        for replica in self.replicas:
+            replica.engine.dispose(close=close)
+
+    def is_healthy(self, replica):
+        now = time.monotonic()
+        with self._lock:
+            due = replica.checked_at is None or now - replica.checked_at >= self.health_check_interval
+            if due:
+                # claim the probe so concurrent requests keep using the last result
+                replica.checked_at = now
+        return replica.check() if due else replica.healthy
+
+    def choose(self):
+        # the next healthy replica in round-robin order, or None for the primary
+        if not self.replicas:
+            return None
+        start = next(self._next)
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(start + i) % len(self.replicas)]
+            if self.is_healthy(replica):
+                return replica
+        return None
+
+    def _choose(self):
+        g._read_replica = None
+        if request.method in SAFE_METHODS and self.replicas \
+                and session.get('_read_primary_until', 0) <= time.time():
+            g._read_replica = self.choose()
+
+    def _remember_write(self, response):
+        if request.method not in SAFE_METHODS and self.replicas:
+            session['_read_primary_until'] = time.time() + self.read_your_writes_seconds
+        return response
+
+    def _release(self, error=None):
+        g.pop('_read_replica', None)
+
+    def read_engine(self):
+        # the replica engine chosen for the current request, if any
+        if not has_request_context():
+            return None
+        replica = g.get('_read_replica')
+        return replica.engine if replica is not None else None
+
+
+replicas = Replicas()
+
+
+class RoutingSession(SignallingSession):
+    def get_bind(self, mapper=None, clause=None):
+        engine = replicas.read_engine()
+        if engine is not None and not self._flushing and not getattr(clause, 'is_dml', False):
+            return engine
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def create_engine(self, sa_url, engine_opts):
+        return super().create_engine(sa_url, engine_options(sa_url, engine_opts))
@@ -0,0 +1,50 @@
+from sqlalchemy import text
+
+from models import db
+
+SEARCH_RESULTS_PER_PAGE = 10
+
+# the SQLite trigram tokenizer cannot match terms shorter than one trigram
+FTS_MIN_TERM_LENGTH = 3
+
+
+def escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+'''
+search_by_name(model, search_term, page)
+    case-insensitive substring match on <model>.name, best match first.
+    Returns (total matches, [(id, name, upcoming_shows_count), ...] for the requested page).
+'''
+
+
+def search_by_name(model, search_term, page=1, per_page=SEARCH_RESULTS_PER_PAGE):
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite' and len(search_term) >= FTS_MIN_TERM_LENGTH:
+        return _search_fts(model, search_term, page, per_page)
+
+    query = db.session.query(model.id, model.name, model.upcoming_shows_count)
+    if search_term:
+        query = query.filter(model.name.ilike('%' + escape_like(search_term) + '%', escape='\\'))
+    total = query.order_by(None).count()
+    if dialect == 'postgresql' and search_term:
+        query = query.order_by(db.func.similarity(model.name, search_term).desc(), model.name, model.id)
+    else:
+        query = query.order_by(model.name, model.id)
+    return total, query.limit(per_page).offset((page - 1) * per_page).all()
+
+
+def _search_fts(model, search_term, page, per_page):
+    table = model.__tablename__
+    fts = table + '_search'
+    match = '"' + search_term.replace('"', '""') + '"'
+    total = db.session.execute(
+        text('SELECT count(*) FROM "{0}" WHERE "{0}" MATCH :match'.format(fts)),
+        {'match': match}).scalar()
+    rows = db.session.execute(
+        text('SELECT t.id, t.name, t.upcoming_shows_count FROM "{0}" JOIN "{1}" t ON t.id = "{0}".rowid '
+             'WHERE "{0}" MATCH :match ORDER BY "{0}".rank, t.name, t.id '
+             'LIMIT :limit OFFSET :offset'.format(fts, table)),
+        {'match': match, 'limit': per_page, 'offset': (page - 1) * per_page}).fetchall()
+    return total, rows
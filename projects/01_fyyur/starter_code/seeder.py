@@ -0,0 +1,190 @@
+import datetime
+import itertools
+import random
+import time
+
+import geo
+from counters import reconcile_upcoming_shows
+from forms import ArtistForm
+from importer import batches
+from models import db, Venue, Artist, Show, Genre, venue_genres, artist_genres
+
+'''
+Synthetic data at realistic scale, for benchmarks and capacity tests.
+
+Listings are spread over cities in proportion to population (venues
+scattered around the city centre, with coordinates), each with one
+to three genres skewed towards the popular ones. Shows pick venues and
+artists with a Zipf-like skew (a few very busy ones, a long tail), fall
+mostly on Thursday to Saturday evenings, and span the past year and the
+next six months. Each evening has three two-hour slots and no venue or
+artist is booked twice in a slot, so the data satisfies the double booking
+constraints; a fully booked venue simply gets no more shows. Rows go in
+through Core executemany inserts, one transaction per batch, and counters
+are reconciled once at the end. Seed into a database without shows, or
+bookings may collide with existing ones.
+'''
+
+BATCH_SIZE = 10000
+
+# (city, state, relative weight ~ metro population, latitude, longitude)
+CITIES = [
+    ('New York', 'NY', 196, 40.71, -74.01), ('Los Angeles', 'CA', 131, 34.05, -118.24),
+    ('Chicago', 'IL', 95, 41.88, -87.63), ('Dallas', 'TX', 76, 32.78, -96.80),
+    ('Houston', 'TX', 71, 29.76, -95.37), ('Washington', 'DC', 63, 38.91, -77.04),
+    ('Miami', 'FL', 61, 25.76, -80.19), ('Philadelphia', 'PA', 61, 39.95, -75.17),
+    ('Atlanta', 'GA', 60, 33.75, -84.39), ('Boston', 'MA', 49, 42.36, -71.06),
+    ('Phoenix', 'AZ', 49, 33.45, -112.07), ('San Francisco', 'CA', 47, 37.77, -122.42),
+    ('Detroit', 'MI', 43, 42.33, -83.05), ('Seattle', 'WA', 40, 47.61, -122.33),
+    ('Minneapolis', 'MN', 37, 44.98, -93.27), ('San Diego', 'CA', 33, 32.72, -117.16),
+    ('Denver', 'CO', 30, 39.74, -104.99), ('Baltimore', 'MD', 28, 39.29, -76.61),
+    ('St. Louis', 'MO', 28, 38.63, -90.20), ('Tampa', 'FL', 32, 27.95, -82.46),
+    ('Portland', 'OR', 25, 45.52, -122.68), ('Austin', 'TX', 23, 30.27, -97.74),
+    ('Nashville', 'TN', 20, 36.16, -86.78), ('New Orleans', 'LA', 13, 29.95, -90.07),
+    ('Las Vegas', 'NV', 23, 36.17, -115.14), ('Kansas City', 'MO', 22, 39.10, -94.58),
+    ('Cleveland', 'OH', 21, 41.50, -81.69), ('Memphis', 'TN', 13, 35.15, -90.05),
+]
+# spread of venues around a city centre, in degrees (~10km)
+CITY_SPREAD = 0.1
+
+GENRES = [name for name, label in ArtistForm.genres.kwargs['choices']]
+
+NAME_WORDS = [
+    'Blue', 'Velvet', 'Electric', 'Golden', 'Midnight', 'Silver', 'Wild', 'Crimson', 'Echo', 'Neon',
+    'Lost', 'Rolling', 'Broken', 'Iron', 'Hollow', 'Royal', 'Lucky', 'Paper', 'Cosmic', 'Quiet',
+]
+NAME_NOUNS = [
+    'Hop', 'Lounge', 'Room', 'Hall', 'Tavern', 'Garden', 'Stage', 'Band', 'Collective', 'Kings',
+    'Owls', 'Riders', 'Sisters', 'Machine', 'Parade', 'Tigers', 'Club', 'Den', 'House', 'Theatre',
+]
+
+# weekday (Mon=0) weights and evening slots for show start times
+DAYS = 547
+WEEKDAY_WEIGHTS = [4, 5, 7, 12, 20, 24, 10]
+SLOT_HOURS = [18, 20, 22]
+SLOT_WEIGHTS = [25, 45, 30]
+SHOW_DURATION = datetime.timedelta(hours=2)
+
+
+def zipf_weights(count, skew=0.7):
+    return list(itertools.accumulate(1 / (rank ** skew) for rank in range(1, count + 1)))
+
+
+def name(rng, i):
+    return '%s %s %d' % (rng.choice(NAME_WORDS), rng.choice(NAME_NOUNS), i)
+
+
+def genre_ids(rng, genres, genre_weights):
+    return set(rng.choices(genres, cum_weights=genre_weights, k=rng.randint(1, 3)))
+
+
+def listing_rows(rng, model, count, start):
+    city_weights = list(itertools.accumulate(weight for city, state, weight, lat, lng in CITIES))
+    for i in range(start, start + count):
+        city, state, weight, lat, lng = rng.choices(CITIES, cum_weights=city_weights)[0]
+        row = {
+            'name': name(rng, i),
+            'city': city,
+            'state': state,
+            'phone': '%03d-%03d-%04d' % (rng.randint(200, 999), rng.randint(200, 999), rng.randint(0, 9999)),
+            'facebook_link': 'https://www.facebook.com/fyyur%d' % i,
+            'image_link': 'https://images.example.com/%d.jpg' % i,
+        }
+        if model is Venue:
+            lat, lng = rng.gauss(lat, CITY_SPREAD), rng.gauss(lng, CITY_SPREAD)
+            row.update(address='%d %s St' % (rng.randint(1, 9999), rng.choice(NAME_WORDS)),
+                       seeking_talent=rng.random() < 0.3,
+                       latitude=lat, longitude=lng, geohash=geo.encode(lat, lng))
+        else:
+            row.update(seeking_venue=rng.random() < 0.4)
+        yield row
+
+
+def insert_listings(model, association, fk, count, genres, rng, batch_size):
+    # returns the new ids; each batch inserts rows, then their genre links, in one transaction
+    genre_weights = zipf_weights(len(genres), skew=0.8)
+    last_id = db.session.query(db.func.max(model.id)).scalar() or 0
+    ids = []
+    for batch in batches(listing_rows(rng, model, count, last_id + 1), batch_size):
+        db.session.execute(model.__table__.insert(), batch)
+        batch_ids = [id for (id,) in db.session.query(model.id).filter(model.id > last_id).order_by(model.id)]
+        db.session.execute(association.insert(), [
+            {fk: id, 'genre_id': genre_id} for id in batch_ids for genre_id in genre_ids(rng, genres, genre_weights)])
+        db.session.commit()
+        last_id = batch_ids[-1]
+        ids.extend(batch_ids)
+    return ids
+
+
+def shows_per_day(count, first_day):
+    # spread count over DAYS days by weekday weight, rounding so the total is exact
+    weights = list(itertools.accumulate(
+        WEEKDAY_WEIGHTS[(first_day + datetime.timedelta(days=i)).weekday()] for i in range(DAYS)))
+    previous = 0
+    for cumulative in weights:
+        target = round(count * cumulative / weights[-1])
+        yield target - previous
+        previous = target
+
+
+def show_rows(rng, count, venue_ids, artist_ids, now):
+    venue_weights = zipf_weights(len(venue_ids))
+    artist_weights = zipf_weights(len(artist_ids))
+    # shuffle so busy venues and artists are not simply the oldest rows
+    venue_ids, artist_ids = rng.sample(venue_ids, len(venue_ids)), rng.sample(artist_ids, len(artist_ids))
+    slot_weights = list(itertools.accumulate(SLOT_WEIGHTS))
+    first_day = (now - datetime.timedelta(days=365)).date()
+    for offset, wanted in enumerate(shows_per_day(count, first_day)):
+        day = first_day + datetime.timedelta(days=offset)
+        booked_venues, booked_artists = set(), set()
+        made = attempts = 0
+        # redraw collisions, giving up on a day once it is nearly saturated
+        while made < wanted and attempts < 3 * wanted:
+            size = wanted - made
+            attempts += size
+            venues = rng.choices(venue_ids, cum_weights=venue_weights, k=size)
+            artists = rng.choices(artist_ids, cum_weights=artist_weights, k=size)
+            hours = rng.choices(SLOT_HOURS, cum_weights=slot_weights, k=size)
+            for venue_id, artist_id, hour in zip(venues, artists, hours):
+                if (venue_id, hour) in booked_venues or (artist_id, hour) in booked_artists:
+                    continue
+                booked_venues.add((venue_id, hour))
+                booked_artists.add((artist_id, hour))
+                made += 1
+                start_time = datetime.datetime.combine(day, datetime.time(hour))
+                yield {
+                    'venue_id': venue_id,
+                    'artist_id': artist_id,
+                    'start_time': start_time,
+                    'end_time': start_time + SHOW_DURATION,
+                }
+
+
+def seed(venues, artists, shows, seed=None, batch_size=BATCH_SIZE, log=print):
+    rng = random.Random(seed)
+    now = datetime.datetime.now()
+    started = time.perf_counter()
+    existing = set(name for (name,) in db.session.query(Genre.name))
+    missing = [{'name': genre} for genre in GENRES if genre not in existing]
+    if missing:
+        db.session.execute(Genre.__table__.insert(), missing)
+        db.session.commit()
+    ids = dict(db.session.query(Genre.name, Genre.id).filter(Genre.name.in_(GENRES)))
+    # in form order, so the skew favours the genres listed first
+    genres = [ids[genre] for genre in GENRES]
+
+    venue_ids = insert_listings(Venue, venue_genres, 'venue_id', venues, genres, rng, batch_size)
+    log('venues: {} in {:.1f}s'.format(len(venue_ids), time.perf_counter() - started))
+    artist_ids = insert_listings(Artist, artist_genres, 'artist_id', artists, genres, rng, batch_size)
+    log('artists: {} in {:.1f}s'.format(len(artist_ids), time.perf_counter() - started))
+
+    inserted = 0
+    if shows and venue_ids and artist_ids:
+        for batch in batches(show_rows(rng, shows, venue_ids, artist_ids, now), batch_size):
+            db.session.execute(Show.__table__.insert(), batch)
+            db.session.commit()
+            inserted += len(batch)
+        log('shows: {} in {:.1f}s'.format(inserted, time.perf_counter() - started))
+    reconcile_upcoming_shows(now)
+    log('counters reconciled in {:.1f}s'.format(time.perf_counter() - started))
+    return len(venue_ids), len(artist_ids), inserted
@@ -2,3 +2,40 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+document.addEventListener('click', function (event) {
+  var button = event.target.closest('.delete-listing');
+  if (!button || !window.confirm('Delete this listing and all of its shows?')) {
+    return;
+  }
+  fetch(button.dataset.url, {method: 'DELETE'}).then(function (response) {
+    if (response.ok) {
+      window.location = '/';
+    } else {
+      window.alert('The listing could not be deleted.');
+    }
+  });
+});
+
+document.addEventListener('input', function (event) {
+  var input = event.target.closest('[data-autocomplete]');
+  if (!input) {
+    return;
+  }
+  var query = input.value;
+  var url = '/autocomplete?type=' + input.dataset.autocomplete + '&q=' + encodeURIComponent(query);
+  fetch(url).then(function (response) {
+    return response.ok ? response.json() : {data: []};
+  }).then(function (result) {
+    if (input.value !== query) {
+      return;  // a later keystroke has its own request
+    }
+    var list = input.list;
+    list.innerHTML = '';
+    result.data.forEach(function (match) {
+      var option = document.createElement('option');
+      option.value = match.name;
+      list.appendChild(option);
+    });
+  });
+});
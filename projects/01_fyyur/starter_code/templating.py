@@ -0,0 +1,34 @@
+import os
+import time
+
+from jinja2 import FileSystemBytecodeCache
+
+'''
+Compiled template cache.
+
+Jinja compiles each template to Python bytecode the first time a process
+renders it. With JINJA_BYTECODE_CACHE_DIR set, that bytecode is also saved
+there, so new worker processes (after a deploy, a restart or a scale-out)
+load it instead of parsing and compiling again. Entries are keyed by the
+template's source checksum, so an edited template is recompiled. The
+cache is shared safely between processes, because Jinja writes each entry
+to a temporary file and renames it. precompile() fills the cache for every
+template ahead of time; `flask fyyur precompile` runs it at build time.
+'''
+
+
+def init_bytecode_cache(app):
+    directory = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+
+
+def precompile(app):
+    # compiles every template, saving bytecode when the cache is on; returns {template name: ms}
+    timings = {}
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        started = time.perf_counter()
+        app.jinja_env.get_template(name)
+        timings[name] = (time.perf_counter() - started) * 1000
+    return timings
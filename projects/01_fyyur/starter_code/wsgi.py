@@ -0,0 +1,19 @@
+from app import create_app
+from autocomplete import autocomplete
+
+'''
+WSGI entry point for production servers.
+
+    SECRET_KEY=... gunicorn --preload --workers 4 wsgi:app
+
+With --preload the app is built once in the master and the workers fork from
+it, sharing its memory copy on write; each worker then drops the pooled
+database connections it inherited (see dispose_engines in app.py) and opens
+its own. Without --preload every worker imports and builds its own app.
+
+The autocomplete tries are loaded here too, so preloaded workers start with them.
+'''
+
+app = create_app()
+with app.app_context():
+    autocomplete.load()
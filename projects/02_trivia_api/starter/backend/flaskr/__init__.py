@@ -5,6 +5,7 @@ from sqlalchemy import exc
 from flask_cors import CORS
 import random
 
+from compression import CompressionMiddleware
 from models import setup_db, Question, Category
 
 QUESTIONS_PER_PAGE = 10
@@ -25,6 +26,8 @@ def create_app(test_config=None):
     # create and configure the app
     app = Flask(__name__)
     db = setup_db(app)
+    # gzip/brotli for the JSON responses; /questions pages are a few kB each
+    app.wsgi_app = CompressionMiddleware(app.wsgi_app, {'application/json': (6, 5)})
     '''
     @TODO: Set up CORS. Allow '*' for origins. Delete the sample route after completing the TODOs
     '''